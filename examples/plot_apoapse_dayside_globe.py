@@ -70,7 +70,9 @@ lt = pu.set_bad_pixels_to_nan(
 n_spatial_bins = primary.shape[1]
 
 # Do dayside specific things
-# TODO: FF correct here
+flatfield = pu.get_matching_flatfield(*primary.shape[1:])
+if flatfield is not None:
+    pu.apply_flatfield(primary, flatfield)
 rgb_primary = pu.graphics.histogram_equalize_detector_image(primary) / 255
 
 for swath in np.unique(swath_numbers):
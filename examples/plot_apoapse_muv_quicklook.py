@@ -85,23 +85,17 @@ for daynight in [True, False]:
 
     # Do dayside specific things
     if daynight:
-        # TODO: FF correct here
+        flatfield = pu.get_matching_flatfield(*primary.shape[1:])
+        if flatfield is not None:
+            pu.apply_flatfield(primary, flatfield)
         rgb_primary = pu.graphics.histogram_equalize_detector_image(primary) / 255
     # Do nightside specific things
     else:
-        dds = fc.stack_detector_image_dark_subtracted()
-        dn_unc = fc.stack_detector_image_random_uncertainty_dn()
-        file = fc.get_first_nightside_file()
-
-        spbw = int(np.median(file.binning.spectral_pixel_bin_width))
-        ssi = int(file.binning.spectral_pixel_bin_width[0] / spbw)
-        spapbw = int(np.median(file.binning.spatial_pixel_bin_width))
-        ww = np.median(file.observation.wavelength_width)
-        vg = file.observation.voltage_gain
-        it = file.observation.integration_time
-
-        brightnesses = pu.fit_muv_templates_to_nightside_data(
-            dds, dn_unc, ww, spapbw, spbw, ssi, vg, it)
+        nightside_files = [f for f in files if not f.is_dayside_file()]
+        brightnesses = np.concatenate(
+            [b for _, b in
+             pu.fit_muv_templates_to_nightside_files(nightside_files)],
+            axis=1)
         no_kR = brightnesses[0, ...]
         aurora_kR = brightnesses[1, ...]
 
@@ -8,11 +8,10 @@ Plot MUV flatfield ratios
 
 import matplotlib.pyplot as plt
 import matplotlib.colors as colors
-import numpy as np
 from pyuvs import load_flatfield_mid_hi_res_pipeline, \
     load_flatfield_mid_hi_res_update, load_flatfield_mid_hi_res_my34gds, \
     load_flatfield_mid_res_app_flip, load_flatfield_mid_res_no_app_flip, \
-    load_flatfield_hi_res
+    load_flatfield_hi_res, resample_flatfield
 
 
 def make_scalar_mappable(cmap, vmin, vmax):
@@ -30,19 +29,10 @@ gds = load_flatfield_mid_hi_res_my34gds()
 hires = load_flatfield_hi_res()
 
 # Rescale FF
-master50 = np.zeros((50, 19))
-gds50 = np.zeros((50, 19))
-hires50 = np.zeros((50, 15))
-updated50 = np.zeros((50, 19))
-for i in range(19):
-    foo = np.linspace(0, 132, num=50)
-    bar = np.linspace(0, 132, num=133)
-    master50[:, i] = np.interp(foo, bar, master[:, i])
-    gds50[:, i] = np.interp(foo, bar, gds[:, i])
-    updated50[:, i] = np.interp(foo, bar, update[:, i])
-    if i < 15:
-        hires50[:, i] = np.interp(np.linspace(0, 199, num=50),
-                                  np.linspace(0, 199, num=200), hires[:, i])
+master50 = resample_flatfield(master, 50)
+gds50 = resample_flatfield(gds, 50)
+hires50 = resample_flatfield(hires, 50)
+updated50 = resample_flatfield(update, 50)
 
 cmap = 'inferno'
 font = {'size': 5}
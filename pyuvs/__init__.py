@@ -1,7 +1,73 @@
+"""PyUVS: tools for working with MAVEN/IUVS data.
+
+The lightweight modules are imported eagerly. The subpackages and modules that
+rely on heavy dependencies (statsmodels, astropy, and matplotlib) are only
+imported when one of their attributes is first accessed.
+"""
+from importlib import import_module
+from types import ModuleType
 from .anc import *
+from .binning import *
 from .constants import *
-from .spectra import *
+from .flatfield import *
+from .maps import *
+from .regression import *
 from .swath import *
 from .utils import *
-from . import datafiles
-from . import graphics
+
+
+_lazy_submodules: list[str] = ['datafiles', 'graphics', 'spectra']
+
+_lazy_attributes: dict[str, str] = {
+    'load_standard_fit_templates': 'spectra',
+    'rebin_templates': 'spectra',
+    'convolve_templates': 'spectra',
+    'get_psf_convolved_templates': 'spectra',
+    'pad_spectral_image_with_nan': 'spectra',
+    'rebin_wavelengths': 'spectra',
+    'rebin_muv_wavelengths': 'spectra',
+    'SpectralScheme': 'spectra',
+    'get_spectral_scheme': 'spectra',
+    'get_binning_spectral_scheme': 'spectra',
+    'get_shifted_template_bank': 'spectra',
+    'calculate_calibration_curve': 'spectra',
+    'calculate_muv_observational_calibration_curve': 'spectra',
+    'get_muv_calibration_curve': 'spectra',
+    'fit_muv_templates_to_nightside_data': 'spectra',
+    'fit_muv_templates_to_nightside_files': 'spectra',
+    'find_saturated_bins': 'spectra',
+    'refit_muv_templates_to_nightside_data': 'spectra',
+}
+
+
+def _is_exported(name: str, value) -> bool:
+    # The eager modules do not define __all__, so their star imports also
+    # bring in what they import, like np and Path. Only export pyuvs objects.
+    if name.startswith('_'):
+        return False
+    if isinstance(value, ModuleType):
+        return value.__name__.startswith(f'{__name__}.')
+    if isinstance(value, type) or callable(value):
+        return getattr(value, '__module__', '').startswith(f'{__name__}.')
+    return True
+
+
+__all__: list[str] = sorted(
+    {name for name, value in globals().items() if _is_exported(name, value)} |
+    set(_lazy_submodules) | set(_lazy_attributes))
+
+
+def __getattr__(name: str):
+    if name in _lazy_submodules:
+        return import_module(f'.{name}', __name__)
+    if name in _lazy_attributes:
+        module = import_module(f'.{_lazy_attributes[name]}', __name__)
+        attribute = getattr(module, name)
+        globals()[name] = attribute
+        return attribute
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_lazy_submodules) |
+                  set(_lazy_attributes))
@@ -1,9 +1,35 @@
 """This module provides functions to load in standard dictionaries and arrays
-for working with IUVS data."""
+for working with IUVS data.
+
+All arrays are cached after they are first loaded and are returned as
+read-only views of the cached array. Use :code:`np.copy` on an array if you
+need to modify it.
+
+Arrays can optionally be memory-mapped instead of read into memory. This lets
+every process that uses pyuvs share the same physical pages of the ancillary
+files. Turn this on with :func:`set_ancillary_memory_map` or by setting the
+environment variable :code:`PYUVS_ANCILLARY_MEMORY_MAP=1` before pyuvs is
+imported; the latter is inherited by the workers of a process pool.
+
+The arrays are served from a single packed bundle file when one is available,
+so a process opens and parses one file instead of one per array. The bundle is
+created with :func:`build_ancillary_bundle` and should be rebuilt whenever an
+array in the :code:`anc` directory changes; until then, arrays whose file no
+longer matches the bundle are loaded from their own files.
+"""
+from functools import lru_cache
+from hashlib import sha1
+import json
+import os
 from pathlib import Path
+from typing import Union
 import numpy as np
 
 
+_memory_map: bool = os.environ.get('PYUVS_ANCILLARY_MEMORY_MAP', '0') \
+    not in ['', '0']
+
+
 def _get_package_path() -> Path:
     return Path(__file__).parent.resolve()
 
@@ -12,20 +38,261 @@ def _get_anc_directory() -> Path:
     return _get_package_path() / 'anc'
 
 
-def _get_flatfield_directory() -> Path:
-    return _get_anc_directory() / 'flatfields'
+def _get_bundle_path() -> Path:
+    return _get_anc_directory() / 'ancillary.bundle'
+
+
+_bundle_magic: bytes = b'PYUVSANC'
+_bundle_alignment: int = 64
+
+
+def _align(offset: int) -> int:
+    return -(-offset // _bundle_alignment) * _bundle_alignment
+
+
+def build_ancillary_bundle(bundle_path: Path = None) -> Path:
+    """Pack every ancillary array into a single bundle file.
+
+    The bundle starts with an 8 byte magic string and the 8 byte little-endian
+    length of a JSON header. The header maps each array's path relative to the
+    :code:`anc` directory to its dtype, shape, byte offset, and the size and
+    SHA-1 digest of the file it was packed from. The raw, uncompressed array
+    data follows,
+    each array aligned to 64 bytes so that it can be used in place from a
+    memory map.
+
+    Parameters
+    ----------
+    bundle_path: Path
+        The path where the bundle will be written. If :code:`None`, it is
+        written to the location where the ``load_*`` functions look for it.
+
+    Returns
+    -------
+    Path
+        The path of the bundle.
+
+    Notes
+    -----
+    This empties the ancillary array cache. Arrays that are not in the
+    bundle, or whose file no longer matches the one recorded in the bundle,
+    are still loaded from their individual files. A file is only hashed to
+    check it against the bundle if it was modified after the bundle.
+
+    """
+    bundle_path = _get_bundle_path() if bundle_path is None \
+        else Path(bundle_path)
+    anc_directory = _get_anc_directory()
+    files = sorted(anc_directory.glob('*/*.npy'))
+    arrays = {f.relative_to(anc_directory).as_posix():
+              np.load(str(f), mmap_mode='r') for f in files}
+    file_sizes = {f.relative_to(anc_directory).as_posix(): f.stat().st_size
+                  for f in files}
+    file_digests = {f.relative_to(anc_directory).as_posix():
+                    sha1(f.read_bytes()).hexdigest() for f in files}
+
+    # The header length depends on the offsets, so lay out the data relative
+    # to the header first and then shift it once the header size is known
+    relative_offsets = {}
+    offset = 0
+    for name, array in arrays.items():
+        relative_offsets[name] = offset
+        offset = _align(offset + array.nbytes)
+
+    def make_header(data_offset: int) -> bytes:
+        index = {name: {'dtype': array.dtype.str, 'shape': array.shape,
+                        'offset': data_offset + relative_offsets[name],
+                        'file_size': file_sizes[name],
+                        'file_sha1': file_digests[name]}
+                 for name, array in arrays.items()}
+        return json.dumps(index).encode()
+
+    header_length = len(make_header(0))
+    while True:
+        data_offset = _align(len(_bundle_magic) + 8 + header_length)
+        header = make_header(data_offset)
+        if len(header) == header_length:
+            break
+        header_length = len(header)
+
+    with open(bundle_path, 'wb') as bundle:
+        bundle.write(_bundle_magic)
+        bundle.write(header_length.to_bytes(8, 'little'))
+        bundle.write(header)
+        for name, array in arrays.items():
+            bundle.write(bytes(data_offset + relative_offsets[name] -
+                               bundle.tell()))
+            bundle.write(np.ascontiguousarray(array).tobytes())
+
+    clear_ancillary_cache()
+    return bundle_path
+
+
+@lru_cache(maxsize=1)
+def _open_ancillary_bundle() -> tuple[np.ndarray, dict, int]:
+    bundle_path = _get_bundle_path()
+    if not bundle_path.exists():
+        return np.empty(0, dtype='uint8'), {}, 0
+    buffer = np.memmap(bundle_path, dtype='uint8', mode='r')
+    if buffer[:len(_bundle_magic)].tobytes() != _bundle_magic:
+        raise ValueError(f'{bundle_path} is not an ancillary bundle.')
+    header_start = len(_bundle_magic) + 8
+    header_length = int.from_bytes(
+        buffer[len(_bundle_magic):header_start].tobytes(), 'little')
+    index = json.loads(
+        buffer[header_start:header_start + header_length].tobytes())
+    return buffer, index, bundle_path.stat().st_mtime_ns
+
+
+def _is_bundled_file_current(file_path: Path, entry: dict,
+                             bundle_mtime_ns: int) -> bool:
+    # A file that was regenerated after the bundle was built must not be
+    # shadowed by its old copy in the bundle. Files older than the bundle are
+    # trusted; newer ones, such as those of a fresh checkout, are hashed.
+    try:
+        stat = file_path.stat()
+    except FileNotFoundError:
+        return True
+    if stat.st_size != entry['file_size']:
+        return False
+    if stat.st_mtime_ns <= bundle_mtime_ns:
+        return True
+    return sha1(file_path.read_bytes()).hexdigest() == entry['file_sha1']
+
+
+def _get_bundled_array(subdirectory: str, filename: str,
+                       file_path: Path) -> Union[np.ndarray, None]:
+    buffer, index, bundle_mtime_ns = _open_ancillary_bundle()
+    entry = index.get(f'{subdirectory}/{filename}')
+    if entry is None or \
+            not _is_bundled_file_current(file_path, entry, bundle_mtime_ns):
+        return None
+    return np.ndarray(tuple(entry['shape']), dtype=entry['dtype'],
+                      buffer=buffer, offset=entry['offset'])
+
+
+@lru_cache(maxsize=32)
+def _load_ancillary_array(subdirectory: str, filename: str,
+                          memory_map: bool) -> np.ndarray:
+    file_path = _get_anc_directory() / subdirectory / filename
+    array = _get_bundled_array(subdirectory, filename, file_path)
+    if array is None:
+        if memory_map:
+            # A read-only memory map cannot be made writeable by any view of
+            # it
+            return np.load(str(file_path), mmap_mode='r')
+        array = np.load(str(file_path))
+    elif memory_map:
+        return array
+    # The array must own its memory so that no view of it can be made
+    # writeable again. This also copies bundled arrays out of the memory map.
+    array = np.require(array, requirements='O')
+    array.flags.writeable = False
+    return array
+
+
+def _get_ancillary_array(subdirectory: str, filename: str) -> np.ndarray:
+    array = _load_ancillary_array(subdirectory, filename, _memory_map)
+    return array.view(np.ndarray)
+
+
+def set_ancillary_memory_map(memory_map: bool) -> None:
+    """Set whether ancillary arrays are memory-mapped.
+
+    When enabled, the ``load_*`` functions in this module open their files
+    as read-only memory maps instead of reading them into private memory.
+    Processes that load the same array then share its physical pages, which
+    is most useful when work is spread over a process pool.
+
+    Parameters
+    ----------
+    memory_map: bool
+        True to memory-map the arrays; False to read them into memory.
+
+    Notes
+    -----
+    Changing this setting empties the ancillary array cache.
+
+    See Also
+    --------
+    get_ancillary_memory_map: Get whether ancillary arrays are memory-mapped.
+
+    Examples
+    --------
+    Memory-map the arrays in each worker of a process pool.
+
+    >>> from concurrent.futures import ProcessPoolExecutor
+    >>> import pyuvs as pu
+    >>> executor = ProcessPoolExecutor(
+    ...     initializer=pu.set_ancillary_memory_map, initargs=(True,))
+    >>> executor.shutdown()
+
+    """
+    global _memory_map
+    _memory_map = bool(memory_map)
+    clear_ancillary_cache()
+
+
+def get_ancillary_memory_map() -> bool:
+    """Get whether ancillary arrays are memory-mapped.
+
+    Returns
+    -------
+    bool
+        True if the arrays are memory-mapped; False otherwise.
+
+    See Also
+    --------
+    set_ancillary_memory_map: Set whether ancillary arrays are memory-mapped.
+
+    """
+    return _memory_map
+
+
+def get_ancillary_cache_info():
+    """Get the statistics of the ancillary array cache.
 
+    Every ``load_*`` function in this module reads its file from disk only
+    the first time it is called; later calls are served from a process-wide
+    cache. The cache holds at most 32 arrays and evicts the least recently
+    used array once it is full.
 
-def _get_instrument_directory() -> Path:
-    return _get_anc_directory() / 'instrument'
+    Returns
+    -------
+    functools._CacheInfo
+        Named tuple with the number of cache hits, misses, the maximum size,
+        and the current size.
+
+    See Also
+    --------
+    clear_ancillary_cache: Empty the ancillary array cache.
+
+    Examples
+    --------
+    Loading the same array twice only reads it from disk once.
+
+    >>> import pyuvs as pu
+    >>> pu.clear_ancillary_cache()
+    >>> template = pu.load_template_no_nightglow()
+    >>> template = pu.load_template_no_nightglow()
+    >>> info = pu.get_ancillary_cache_info()
+    >>> info.hits, info.misses
+    (1, 1)
 
+    """
+    return _load_ancillary_array.cache_info()
 
-def _get_maps_directory() -> Path:
-    return _get_anc_directory() / 'maps'
 
+def clear_ancillary_cache() -> None:
+    """Empty the ancillary array cache and reset its statistics.
 
-def _get_templates_directory() -> Path:
-    return _get_anc_directory() / 'templates'
+    See Also
+    --------
+    get_ancillary_cache_info: Get the statistics of the ancillary array cache.
+
+    """
+    _load_ancillary_array.cache_clear()
+    _open_ancillary_bundle.cache_clear()
 
 
 # TODO: Fill in the orbit range
@@ -62,8 +329,8 @@ def load_flatfield_mid_hi_res_pipeline() -> np.ndarray:
        plt.show()
 
     """
-    return np.load(str(_get_flatfield_directory() /
-                   'mid-hi-res-flatfield-pipeline.npy'))
+    return _get_ancillary_array(
+        'flatfields', 'mid-hi-res-flatfield-pipeline.npy')
 
 
 def load_flatfield_mid_hi_res_update() -> np.ndarray:
@@ -102,8 +369,8 @@ def load_flatfield_mid_hi_res_update() -> np.ndarray:
        plt.show()
 
     """
-    return np.load(str(_get_flatfield_directory() /
-                   'mid-hi-res-flatfield-update.npy'))
+    return _get_ancillary_array(
+        'flatfields', 'mid-hi-res-flatfield-update.npy')
 
 
 # TODO: Fill in the orbit range
@@ -141,8 +408,8 @@ def load_flatfield_mid_hi_res_my34gds() -> np.ndarray:
        plt.show()
 
     """
-    return np.load(str(_get_flatfield_directory() /
-                   'mid-hi-res-flatfield-my34gds.npy'))
+    return _get_ancillary_array(
+        'flatfields', 'mid-hi-res-flatfield-my34gds.npy')
 
 
 # TODO: Fill in the orbit range
@@ -179,8 +446,7 @@ def load_flatfield_hi_res() -> np.ndarray:
        plt.show()
 
     """
-    return np.load(str(_get_flatfield_directory() /
-                   'hi-res-flatfield.npy'))
+    return _get_ancillary_array('flatfields', 'hi-res-flatfield.npy')
 
 
 def load_flatfield_mid_res_app_flip() -> np.ndarray:
@@ -217,8 +483,7 @@ def load_flatfield_mid_res_app_flip() -> np.ndarray:
        plt.show()
 
     """
-    return np.load(str(_get_flatfield_directory() /
-                   'mid-res-flatfield-APP-flip.npy'))
+    return _get_ancillary_array('flatfields', 'mid-res-flatfield-APP-flip.npy')
 
 
 def load_flatfield_mid_res_no_app_flip() -> np.ndarray:
@@ -255,8 +520,8 @@ def load_flatfield_mid_res_no_app_flip() -> np.ndarray:
        plt.show()
 
     """
-    return np.load(str(_get_flatfield_directory() /
-                   'mid-res-flatfield-no-APP-flip.npy'))
+    return _get_ancillary_array(
+        'flatfields', 'mid-res-flatfield-no-APP-flip.npy')
 
 
 def load_fuv_sensitivity_curve_manufacturer() -> np.ndarray:
@@ -302,8 +567,8 @@ def load_fuv_sensitivity_curve_manufacturer() -> np.ndarray:
        plt.show()
 
     """
-    return np.load(str(_get_instrument_directory() /
-                       'fuv_sensitivity_curve_manufacturer.npy'))
+    return _get_ancillary_array(
+        'instrument', 'fuv_sensitivity_curve_manufacturer.npy')
 
 
 def load_muv_point_spread_function() -> np.ndarray:
@@ -341,8 +606,7 @@ def load_muv_point_spread_function() -> np.ndarray:
        plt.show()
 
     """
-    return np.load(str(_get_instrument_directory() /
-                       'muv_point_spread_function.npy'))
+    return _get_ancillary_array('instrument', 'muv_point_spread_function.npy')
 
 
 def load_muv_sensitivity_curve_manufacturer() -> np.ndarray:
@@ -390,8 +654,8 @@ def load_muv_sensitivity_curve_manufacturer() -> np.ndarray:
        plt.show()
 
     """
-    return np.load(str(_get_instrument_directory() /
-                       'muv_sensitivity_curve_manufacturer.npy'))
+    return _get_ancillary_array(
+        'instrument', 'muv_sensitivity_curve_manufacturer.npy')
 
 
 def load_muv_sensitivity_curve_observational() -> np.ndarray:
@@ -438,8 +702,8 @@ def load_muv_sensitivity_curve_observational() -> np.ndarray:
        plt.show()
 
     """
-    return np.load(str(_get_instrument_directory() /
-                       'muv_sensitivity_curve_observational.npy'))
+    return _get_ancillary_array(
+        'instrument', 'muv_sensitivity_curve_observational.npy')
 
 
 def load_muv_wavelength_edges() -> np.ndarray:
@@ -455,8 +719,7 @@ def load_muv_wavelength_edges() -> np.ndarray:
     This array has a shape of (1025,).
 
     """
-    return np.load(str(_get_instrument_directory() /
-                       'muv_wavelength_edges.npy'))
+    return _get_ancillary_array('instrument', 'muv_wavelength_edges.npy')
 
 
 def load_muv_wavelength_centers() -> np.ndarray:
@@ -472,8 +735,7 @@ def load_muv_wavelength_centers() -> np.ndarray:
     This array has a shape of (1025,).
 
     """
-    return np.load(str(_get_instrument_directory() /
-                       'muv_wavelength_centers.npy'))
+    return _get_ancillary_array('instrument', 'muv_wavelength_centers.npy')
 
 
 def load_map_magnetic_field_closed_probability() -> np.ndarray:
@@ -516,9 +778,8 @@ def load_map_magnetic_field_closed_probability() -> np.ndarray:
        plt.show()
 
     """
-    file_path = _get_maps_directory() / \
-        'magnetic_field_closed_probability.npy'
-    return np.load(str(file_path))
+    return _get_ancillary_array(
+        'maps', 'magnetic_field_closed_probability.npy')
 
 
 def load_map_magnetic_field_open_probability() -> np.ndarray:
@@ -561,9 +822,7 @@ def load_map_magnetic_field_open_probability() -> np.ndarray:
        plt.show()
 
     """
-    file_path = _get_maps_directory() / \
-        'magnetic_field_open_probability.npy'
-    return np.load(str(file_path))
+    return _get_ancillary_array('maps', 'magnetic_field_open_probability.npy')
 
 
 def load_map_mars_surface() -> np.ndarray:
@@ -605,8 +864,7 @@ def load_map_mars_surface() -> np.ndarray:
        plt.show()
 
     """
-    file_path = _get_maps_directory() / 'mars_surface.npy'
-    return np.load(str(file_path))
+    return _get_ancillary_array('maps', 'mars_surface.npy')
 
 
 def load_template_co_cameron() -> np.ndarray:
@@ -645,7 +903,7 @@ def load_template_co_cameron() -> np.ndarray:
        plt.show()
 
     """
-    return np.load(str(_get_templates_directory() / 'co_cameron_bands.npy'))
+    return _get_ancillary_array('templates', 'co_cameron_bands.npy')
 
 
 def load_template_co_plus_1st_negative() -> np.ndarray:
@@ -684,7 +942,7 @@ def load_template_co_plus_1st_negative() -> np.ndarray:
        plt.show()
 
     """
-    return np.load(str(_get_templates_directory() / 'co+_first_negative.npy'))
+    return _get_ancillary_array('templates', 'co+_first_negative.npy')
 
 
 def load_template_co2_plus_fdb() -> np.ndarray:
@@ -723,8 +981,7 @@ def load_template_co2_plus_fdb() -> np.ndarray:
        plt.show()
 
     """
-    return np.load(str(_get_templates_directory() /
-                       'co2+_fox_duffendack_barker.npy'))
+    return _get_ancillary_array('templates', 'co2+_fox_duffendack_barker.npy')
 
 
 def load_template_co2_plus_uvd() -> np.ndarray:
@@ -763,8 +1020,7 @@ def load_template_co2_plus_uvd() -> np.ndarray:
        plt.show()
 
     """
-    return np.load(str(_get_templates_directory() /
-                       'co2+_ultraviolet_doublet.npy'))
+    return _get_ancillary_array('templates', 'co2+_ultraviolet_doublet.npy')
 
 
 def load_template_n2_vk() -> np.ndarray:
@@ -801,8 +1057,7 @@ def load_template_n2_vk() -> np.ndarray:
        plt.show()
 
     """
-    return np.load(str(_get_templates_directory() /
-                       'nitrogen_vegard_kaplan.npy'))
+    return _get_ancillary_array('templates', 'nitrogen_vegard_kaplan.npy')
 
 
 def load_template_no_nightglow() -> np.ndarray:
@@ -841,7 +1096,7 @@ def load_template_no_nightglow() -> np.ndarray:
        plt.show()
 
     """
-    return np.load(str(_get_templates_directory() / 'no_nightglow.npy'))
+    return _get_ancillary_array('templates', 'no_nightglow.npy')
 
 
 def load_template_oxygen_2972() -> np.ndarray:
@@ -880,7 +1135,7 @@ def load_template_oxygen_2972() -> np.ndarray:
        plt.show()
 
     """
-    return np.load(str(_get_templates_directory() / 'oxygen_2972.npy'))
+    return _get_ancillary_array('templates', 'oxygen_2972.npy')
 
 
 def load_template_solar_continuum() -> np.ndarray:
@@ -919,4 +1174,4 @@ def load_template_solar_continuum() -> np.ndarray:
        plt.show()
 
     """
-    return np.load(str(_get_templates_directory() / 'solar_continuum.npy'))
+    return _get_ancillary_array('templates', 'solar_continuum.npy')
@@ -0,0 +1,97 @@
+"""This module provides functions to rebin arrays to IUVS binning tables.
+"""
+import numpy as np
+
+
+def _get_bin_edges(pixel: np.ndarray) -> np.ndarray:
+    # Binning tables are stored with a leading integration dimension
+    pixel = np.asarray(pixel)
+    return pixel.reshape(-1, pixel.shape[-1])[0].astype(int) \
+        if pixel.ndim > 1 else pixel.astype(int)
+
+
+def rebin_pixels(
+        array: np.ndarray, pixel_low: np.ndarray, pixel_high: np.ndarray,
+        axis: int = -1, average: bool = False) -> np.ndarray:
+    """Rebin an axis of detector pixels to an arbitrary binning table.
+
+    Parameters
+    ----------
+    array: np.ndarray
+        The array to rebin. This array can have any shape; :code:`axis` must
+        correspond to detector pixels.
+    pixel_low: np.ndarray
+        The first detector pixel in each bin, such as
+        :code:`L1bFile.binning.spectral_pixel_low`. This can be 1-dimensional
+        or have a leading integration dimension, in which case the first
+        integration's table is used.
+    pixel_high: np.ndarray
+        The last detector pixel in each bin. This must have the same shape as
+        :code:`pixel_low`.
+    axis: int
+        The axis of detector pixels.
+    average: bool
+        Whether to average the pixels in each bin instead of summing them.
+        Sums suit counts and templates; averages suit wavelengths.
+
+    Returns
+    -------
+    np.ndarray
+        The rebinned array. The pixel axis is replaced by one of length
+        n_bins.
+
+    Raises
+    ------
+    ValueError
+        Raised if a bin does not fit within the pixel axis or ends before it
+        starts.
+
+    Notes
+    -----
+    Each bin is the difference of the cumulative sum of :code:`array` at its
+    edges, so the bins can have any width and can overlap or leave gaps, and
+    all of the bins of all leading dimensions are made in one pass. A bin
+    that contains a NaN is NaN.
+
+    Examples
+    --------
+    Rebin the MUV templates to a table with a wide first bin and 4 pixels per
+    bin afterwards.
+
+    >>> import numpy as np
+    >>> import pyuvs as pu
+    >>> templates = np.vstack([pu.load_template_no_nightglow(),
+    ...                        pu.load_template_co_cameron()])
+    >>> low = np.concatenate([[0], np.arange(80, 1024, 4)])
+    >>> high = np.concatenate([[79], np.arange(83, 1024, 4)])
+    >>> pu.rebin_pixels(templates, low, high).shape
+    (2, 237)
+
+    Rebin the wavelengths with the same table.
+
+    >>> wavelengths = pu.load_muv_wavelength_centers()
+    >>> pu.rebin_pixels(wavelengths, low, high, average=True).shape
+    (237,)
+
+    """
+    low = _get_bin_edges(pixel_low)
+    high = _get_bin_edges(pixel_high)
+    array = np.moveaxis(np.asarray(array), axis, -1)
+    n_pixels = array.shape[-1]
+    if np.any(low < 0) or np.any(high >= n_pixels) or np.any(high < low):
+        message = f'The bins must start and end within the {n_pixels} ' \
+                  f'pixels and cannot end before they start.'
+        raise ValueError(message)
+
+    # Pad a leading 0 so bin [low, high] is cumsum[high + 1] - cumsum[low]
+    pad = [(0, 0)] * (array.ndim - 1) + [(1, 0)]
+    nan = np.isnan(array)
+    cumulative_sum = np.pad(np.cumsum(np.where(nan, 0, array), axis=-1,
+                                      dtype=float), pad)
+    cumulative_nan = np.pad(np.cumsum(nan, axis=-1), pad)
+    rebinned = cumulative_sum[..., high + 1] - cumulative_sum[..., low]
+    rebinned[cumulative_nan[..., high + 1] > cumulative_nan[..., low]] = \
+        np.nan
+    if average:
+        rebinned /= high - low + 1
+    return np.moveaxis(rebinned, -1, axis)
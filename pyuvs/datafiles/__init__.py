@@ -1,3 +1,4 @@
+from .catalog import *
 from .contents import *
 from .path import *
 from .filename import *
\ No newline at end of file
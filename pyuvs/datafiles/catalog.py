@@ -0,0 +1,228 @@
+"""This module provides a persistent catalog of the data files on a computer.
+"""
+import os
+import sqlite3
+from pathlib import Path
+from pyuvs.datafiles.filename import DataFilename
+from pyuvs.datafiles.path import find_latest_versions
+
+
+_schema: str = '''
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime_ns INTEGER
+);
+CREATE INDEX IF NOT EXISTS directories_parent ON directories (parent);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    directory TEXT,
+    level TEXT,
+    segment TEXT,
+    orbit INTEGER,
+    channel TEXT,
+    timestamp TEXT,
+    version TEXT,
+    revision TEXT
+);
+CREATE INDEX IF NOT EXISTS files_directory ON files (directory);
+CREATE INDEX IF NOT EXISTS files_observation ON files
+    (orbit, segment, channel, level, timestamp, version, revision);
+'''
+
+
+def _parse_filename(path: str) -> tuple:
+    # Files that are not named like IUVS data files are not cataloged
+    filename = DataFilename(path)
+    try:
+        return (filename.level, filename.segment, filename.orbit,
+                filename.channel, filename.timestamp, filename.version,
+                filename.revision)
+    except (IndexError, ValueError):
+        return None
+
+
+class FileCatalog:
+    """A persistent, indexed catalog of the IUVS data files in a directory
+    tree.
+
+    Globbing an orbit block directory for every query is slow on large
+    archives, especially on network storage. This catalogs every data file
+    under a directory once, keeps the catalog in an SQLite database, and
+    answers queries with indexed lookups.
+
+    Parameters
+    ----------
+    data_directory: Path
+        The directory that holds the data files. Files in any of its
+        subdirectories, such as the orbit block directories, are cataloged.
+    database: Path
+        The SQLite database file of the catalog. It is created if it does not
+        exist. If :code:`None`, the catalog is only kept in memory.
+    refresh: bool
+        Whether to refresh the catalog when it is opened.
+
+    See Also
+    --------
+    find_latest_file_paths_from_block: Find files without a catalog.
+
+    Notes
+    -----
+    The catalog is built with one :code:`os.scandir` walk of the directory
+    tree. Refreshing it only lists the directories whose modification time
+    changed since they were cataloged, so only the directories that gained
+    or lost files are rescanned.
+
+    Files are matched on the exact segment, orbit, and channel in their
+    filenames rather than with glob patterns.
+
+    Examples
+    --------
+    Catalog an archive and find the latest apoapse MUV files of an orbit.
+
+    >>> from pathlib import Path
+    >>> import pyuvs as pu
+    >>> data_directory = Path('/tmp/iuvs-data')
+    >>> with pu.datafiles.FileCatalog(data_directory) as catalog:
+    ...     files = catalog.find_latest_apoapse_muv_file_paths(
+    ...         3453)  # doctest: +SKIP
+
+    """
+    def __init__(self, data_directory: Path, database: Path = None,
+                 refresh: bool = True):
+        self._data_directory = Path(data_directory)
+        self._connection = sqlite3.connect(
+            ':memory:' if database is None else str(database))
+        self._connection.executescript(_schema)
+        if refresh:
+            self.refresh()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self) -> None:
+        """Close the connection to the database.
+
+        """
+        self._connection.close()
+
+    def refresh(self) -> None:
+        """Update the catalog to match the files on disk.
+
+        """
+        known_directories = {
+            path: mtime_ns for path, mtime_ns in self._connection.execute(
+                'SELECT path, mtime_ns FROM directories')}
+        visited = set()
+        directories = [(str(self._data_directory), None)]
+        with self._connection:
+            while directories:
+                directory, parent = directories.pop()
+                try:
+                    mtime_ns = os.stat(directory).st_mtime_ns
+                except FileNotFoundError:
+                    continue
+                visited.add(directory)
+                if known_directories.get(directory) == mtime_ns:
+                    subdirectories = self._connection.execute(
+                        'SELECT path FROM directories WHERE parent = ?',
+                        (directory,))
+                    directories.extend((path, directory)
+                                       for path, in subdirectories)
+                    continue
+                directories.extend((subdirectory, directory) for subdirectory
+                                   in self._scan_directory(directory))
+                self._connection.execute(
+                    'INSERT OR REPLACE INTO directories VALUES (?, ?, ?)',
+                    (directory, parent, mtime_ns))
+
+            removed = [(path,) for path in known_directories
+                       if path not in visited]
+            self._connection.executemany(
+                'DELETE FROM files WHERE directory = ?', removed)
+            self._connection.executemany(
+                'DELETE FROM directories WHERE path = ?', removed)
+
+    def _scan_directory(self, directory: str) -> list[str]:
+        subdirectories = []
+        files = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    subdirectories.append(entry.path)
+                elif entry.name.endswith('.fits.gz'):
+                    fields = _parse_filename(entry.path)
+                    if fields is not None:
+                        files.append((entry.path, directory) + fields)
+        self._connection.execute('DELETE FROM files WHERE directory = ?',
+                                 (directory,))
+        self._connection.executemany(
+            'INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            files)
+        return subdirectories
+
+    def find_all_file_paths(self, segment: str, orbit: int,
+                            channel: str) -> list[Path]:
+        """Find all cataloged data file paths of an observation.
+
+        Parameters
+        ----------
+        segment: str
+            The orbital segment.
+        orbit: int
+            The orbit number.
+        channel: str
+            The instrument channel.
+
+        Returns
+        -------
+        list[Path]
+            Sorted list of the matching paths.
+
+        """
+        rows = self._connection.execute(
+            'SELECT path FROM files WHERE orbit = ? AND segment = ? AND '
+            'channel = ? ORDER BY path', (orbit, segment, channel))
+        return [Path(path) for path, in rows]
+
+    def find_latest_file_paths(self, segment: str, orbit: int,
+                               channel: str) -> list[Path]:
+        """Find the latest cataloged data file paths of an observation.
+
+        Parameters
+        ----------
+        segment: str
+            The orbital segment.
+        orbit: int
+            The orbit number.
+        channel: str
+            The instrument channel.
+
+        Returns
+        -------
+        list[Path]
+            The latest matching paths.
+
+        """
+        all_files = self.find_all_file_paths(segment, orbit, channel)
+        latest_files = set(find_latest_versions(all_files))
+        return [f for f in all_files if f in latest_files]
+
+    def find_latest_apoapse_muv_file_paths(self, orbit: int) -> list[Path]:
+        """Find the latest cataloged apoapse MUV data file paths of an orbit.
+
+        Parameters
+        ----------
+        orbit: int
+            The orbit number.
+
+        Returns
+        -------
+        list[Path]
+            The latest apoapse MUV file paths from the given orbit.
+
+        """
+        return self.find_latest_file_paths('apoapse', orbit, 'muv')
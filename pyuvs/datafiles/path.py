@@ -1,8 +1,10 @@
 """This module provides functions for finding data files on a computer.
 """
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
 import math
+import os
 from pathlib import Path
-from pyuvs.datafiles.filename import DataFilename
 
 
 def make_orbit_code(orbit: int) -> str:
@@ -125,6 +127,67 @@ def find_all_file_paths(data_directory: Path, segment: str, orbit: int,
     return sorted(data_directory.glob(data_filename_pattern))
 
 
+def _get_observation_and_version(file: Path) -> tuple[tuple, tuple]:
+    # The filenames look like
+    # mvn_iuv_l1b_apoapse-orbit03453-muv_20160708T044652_v13_r01.fits.gz, and
+    # the description holds the segment, orbit, and channel
+    stem = os.fspath(file).rpartition(os.sep)[2].partition('.')[0]
+    _, _, _, description, timestamp, version, revision = stem.split('_')
+    # Stage (s) revisions are superseded by released (r) ones
+    revision_rank = (revision[0] == 'r', int(revision[1:]))
+    return (description, timestamp), (int(version[1:]),) + revision_rank
+
+
+def find_latest_versions(files: list[Path]) -> list[Path]:
+    """Find the latest version of each observation in a list of files.
+
+    Parameters
+    ----------
+    files: list[Path]
+        Collection of paths of IUVS data files.
+
+    Returns
+    -------
+    list[Path]
+        The path of the latest version and revision of each observation, in
+        the order they first appear in :code:`files`.
+
+    Notes
+    -----
+    The files are grouped by their segment, orbit, channel, and timestamp in
+    one pass, so this takes linear time and does not depend on the order of
+    :code:`files`. Versions and revisions are compared by their numbers, and
+    a stage revision (such as s01) ranks below any released revision (such
+    as r01) of the same version.
+
+    Examples
+    --------
+    Find the latest of 3 versions of a file.
+
+    >>> from pyuvs.datafiles.path import find_latest_versions
+    >>> name = 'mvn_iuv_l1b_apoapse-orbit03453-muv_20160708T044652_{}.fits.gz'
+    >>> files = [name.format(v) for v in ['v13_r01', 'v13_s02', 'v09_r03']]
+    >>> find_latest_versions(files) == [files[0]]
+    True
+
+    """
+    return [files[index] for index in _find_latest_indices(files)]
+
+
+def _find_latest_indices(files: list[Path]) -> list[int]:
+    return _find_latest_parsed_indices(
+        [_get_observation_and_version(file) for file in files])
+
+
+def _find_latest_parsed_indices(parsed_files: list[tuple[tuple, tuple]]) \
+        -> list[int]:
+    latest = {}
+    for index, (observation, version) in enumerate(parsed_files):
+        if observation not in latest or version > latest[observation][0]:
+            latest[observation] = (version, index)
+    return [index for _, index in latest.values()]
+
+
 def find_outdated_file_paths(files: list[Path]) -> list[Path]:
     """Find the outdated files from a list of files.
 
@@ -138,22 +201,13 @@ def find_outdated_file_paths(files: list[Path]) -> list[Path]:
     list[Path]
         All of the outdated data file paths.
 
+    See Also
+    --------
+    find_latest_versions: Find the files that are not outdated.
+
     """
-    filenames = [str(f).replace('s0', 'a0') for f in files]
-    last_time_stamp = ''
-    last_channel = ''
-    last_file = None
-    old_files = []
-    for f in filenames:
-        df = DataFilename(f)
-        if df.timestamp == last_time_stamp and df.channel == last_channel:
-            old_files.append(Path(last_file))
-        if 'a0' in f:
-            f = f.replace('a0', 's0')
-        last_time_stamp = df.timestamp
-        last_channel = df.channel
-        last_file = f
-    return old_files
+    latest = set(_find_latest_indices(files))
+    return [file for index, file in enumerate(files) if index not in latest]
 
 
 def find_latest_file_paths(data_directory: Path, segment: str, orbit: int,
@@ -178,8 +232,8 @@ def find_latest_file_paths(data_directory: Path, segment: str, orbit: int,
 
     """
     all_files = find_all_file_paths(data_directory, segment, orbit, channel)
-    outdated_files = find_outdated_file_paths(all_files)
-    return [f for f in all_files if f not in outdated_files]
+    latest = set(_find_latest_indices(all_files))
+    return [f for index, f in enumerate(all_files) if index in latest]
 
 
 def find_latest_file_paths_from_block(data_directory: Path, segment: str,
@@ -228,3 +282,141 @@ def find_latest_apoapse_muv_file_paths_from_block(
     """
     return find_latest_file_paths_from_block(
         data_directory, 'apoapse', orbit, 'muv')
+
+
+def _split_description(description: str) -> tuple[str, int, str]:
+    # The description looks like apoapse-orbit03453-muv
+    parts = description.split('-')
+    orbit_index = [c for c, f in enumerate(parts) if f.startswith('orbit')][0]
+    channel = parts[orbit_index + 1] if orbit_index + 1 < len(parts) \
+        else None
+    return '-'.join(parts[:orbit_index]), \
+        int(parts[orbit_index].removeprefix('orbit')), channel
+
+
+def _scan_block(block_path: Path, segment: str, orbits: set[int],
+                channel: str) -> list[tuple[str, int, tuple, tuple]]:
+    # Parse each filename once and keep the ones of the requested orbits
+    matches = []
+    try:
+        entries = os.scandir(block_path)
+    except FileNotFoundError:
+        return matches
+    with entries:
+        for entry in entries:
+            if not entry.name.endswith('.fits.gz'):
+                continue
+            try:
+                observation, version = \
+                    _get_observation_and_version(entry.name)
+                file_segment, orbit, file_channel = \
+                    _split_description(observation[0])
+            except (IndexError, ValueError):
+                continue
+            if file_segment == segment and file_channel == channel and \
+                    orbit in orbits:
+                matches.append((entry.path, orbit, observation, version))
+    return matches
+
+
+def find_latest_file_paths_from_blocks(
+        data_directory: Path, segment: str, orbits: Iterable[int],
+        channel: str, n_workers: int = 8) -> dict[int, list[Path]]:
+    """Find the latest file paths of many orbits in a given directory, where
+    the directory is divided into blocks of data spanning 100 orbits.
+
+    Parameters
+    ----------
+    data_directory: Path
+        The directory where the data blocks are located.
+    segment: str
+        The segment name.
+    orbits: Iterable[int]
+        The orbit numbers.
+    channel: str
+        The channel name.
+    n_workers: int
+        The number of threads that scan block directories concurrently.
+
+    Returns
+    -------
+    dict[int, list[Path]]
+        The sorted latest file paths of each orbit. Orbits without any files
+        have an empty list.
+
+    Notes
+    -----
+    Each block directory is listed once, however many of its orbits are
+    requested, and the blocks are listed concurrently since listing them is
+    I/O-bound on network storage. Each filename is parsed once. Files are
+    matched on the exact segment and channel in their filenames rather than
+    with glob patterns.
+
+    Examples
+    --------
+    Find the latest apoapse MUV files of a few orbits and get the first file
+    of one of them. This needs the data files on disk.
+
+    >>> from pathlib import Path
+    >>> from pyuvs.datafiles.path import find_latest_file_paths_from_blocks
+    >>> files = find_latest_file_paths_from_blocks(
+    ...     Path('/tmp/iuvs-data'), 'apoapse', range(3450, 3460),
+    ...     'muv')  # doctest: +SKIP
+    >>> files[3453][0].name  # doctest: +SKIP
+    'mvn_iuv_l1b_apoapse-orbit03453-muv_20160708T044652_v13_r01.fits.gz'
+
+    """
+    orbits = set(orbits)
+    block_paths = sorted({data_directory / make_orbit_block_folder(orbit)
+                          for orbit in orbits})
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        blocks = list(executor.map(
+            lambda block_path: _scan_block(block_path, segment, orbits,
+                                           channel), block_paths))
+    matches = [match for block in blocks for match in block]
+
+    files = {orbit: [] for orbit in sorted(orbits)}
+    for index in _find_latest_parsed_indices(
+            [(observation, version) for _, _, observation, version in
+             matches]):
+        path, orbit, _, _ = matches[index]
+        files[orbit].append(Path(path))
+    for orbit_files in files.values():
+        orbit_files.sort()
+    return files
+
+
+def find_latest_file_paths_from_orbit_range(
+        data_directory: Path, segment: str, orbit_start: int, orbit_end: int,
+        channel: str, n_workers: int = 8) -> dict[int, list[Path]]:
+    """Find the latest file paths of a range of orbits in a given directory,
+    where the directory is divided into blocks of data spanning 100 orbits.
+
+    Parameters
+    ----------
+    data_directory: Path
+        The directory where the data blocks are located.
+    segment: str
+        The segment name.
+    orbit_start: int
+        The first orbit number.
+    orbit_end: int
+        The orbit number after the last orbit, like the end of :code:`range`.
+    channel: str
+        The channel name.
+    n_workers: int
+        The number of threads that scan block directories concurrently.
+
+    Returns
+    -------
+    dict[int, list[Path]]
+        The sorted latest file paths of each orbit.
+
+    See Also
+    --------
+    find_latest_file_paths_from_blocks: Find the files of any orbits.
+
+    """
+    return find_latest_file_paths_from_blocks(
+        data_directory, segment, range(orbit_start, orbit_end), channel,
+        n_workers=n_workers)
@@ -0,0 +1,263 @@
+"""This module provides functions to resample flatfields and apply them to
+detector images.
+"""
+from functools import lru_cache
+from typing import Union
+import numpy as np
+from pyuvs.anc import load_flatfield_hi_res, \
+    load_flatfield_mid_hi_res_my34gds, load_flatfield_mid_hi_res_pipeline, \
+    load_flatfield_mid_hi_res_update, load_flatfield_mid_res_app_flip, \
+    load_flatfield_mid_res_no_app_flip
+
+
+_stock_flatfields: dict = {
+    'mid-hi-res-pipeline': load_flatfield_mid_hi_res_pipeline,
+    'mid-hi-res-update': load_flatfield_mid_hi_res_update,
+    'mid-hi-res-my34gds': load_flatfield_mid_hi_res_my34gds,
+    'hi-res': load_flatfield_hi_res,
+    'mid-res-app-flip': load_flatfield_mid_res_app_flip,
+    'mid-res-no-app-flip': load_flatfield_mid_res_no_app_flip}
+
+# The flatfields used by default for each spectral binning, in order of
+# preference
+_default_flatfields: list[str] = ['mid-hi-res-pipeline', 'hi-res']
+
+
+def _make_interpolation_matrix(original: np.ndarray, new: np.ndarray) \
+        -> np.ndarray:
+    # Each row holds the weights that linearly interpolate the original points
+    # onto one new point, clamping to the edges like np.interp does
+    matrix = np.zeros((new.shape[0], original.shape[0]))
+    if original.shape[0] == 1:
+        matrix[:, 0] = 1
+        return matrix
+    lower = np.clip(np.searchsorted(original, new, side='right') - 1, 0,
+                    original.shape[0] - 2)
+    fraction = np.clip((new - original[lower]) /
+                       (original[lower + 1] - original[lower]), 0, 1)
+    rows = np.arange(new.shape[0])
+    matrix[rows, lower] = 1 - fraction
+    matrix[rows, lower + 1] += fraction
+    return matrix
+
+
+def resample_flatfield(
+        flatfield: np.ndarray, n_positions: int,
+        wavelengths: np.ndarray = None,
+        flatfield_wavelengths: np.ndarray = None) -> np.ndarray:
+    """Resample a flatfield to a new number of positions and, optionally, a new
+    wavelength grid.
+
+    Parameters
+    ----------
+    flatfield: np.ndarray
+        The flatfield to resample. This is assumed to be 2-dimensional with
+        shape (n_positions, n_wavelengths).
+    n_positions: int
+        The number of spatial positions to resample to.
+    wavelengths: np.ndarray
+        The wavelengths to resample to. If :code:`None`, the spectral axis is
+        left alone.
+    flatfield_wavelengths: np.ndarray
+        The increasing wavelengths of each spectral bin of the flatfield. This
+        must be provided if :code:`wavelengths` is provided.
+
+    Returns
+    -------
+    np.ndarray
+        The resampled flatfield with shape (n_positions, n_wavelengths).
+
+    Raises
+    ------
+    ValueError
+        Raised if :code:`wavelengths` is provided without
+        :code:`flatfield_wavelengths`.
+
+    Notes
+    -----
+    The positions of both the flatfield and the output are assumed to evenly
+    span the slit. Both axes are linearly interpolated; the interpolation is
+    separable, so the whole flatfield is resampled with two matrix
+    multiplications.
+
+    Examples
+    --------
+    Resample the mid-hi-resolution flatfield to 50 positions.
+
+    >>> import pyuvs as pu
+    >>> flatfield = pu.load_flatfield_mid_hi_res_pipeline()
+    >>> pu.resample_flatfield(flatfield, 50).shape
+    (50, 19)
+
+    """
+    position_matrix = _make_interpolation_matrix(
+        np.linspace(0, 1, num=flatfield.shape[0]),
+        np.linspace(0, 1, num=n_positions))
+    resampled_flatfield = position_matrix @ flatfield
+    if wavelengths is None:
+        return resampled_flatfield
+    if flatfield_wavelengths is None:
+        message = 'flatfield_wavelengths must be provided to resample the ' \
+                  'flatfield to new wavelengths.'
+        raise ValueError(message)
+    wavelength_matrix = _make_interpolation_matrix(
+        np.asarray(flatfield_wavelengths), np.asarray(wavelengths))
+    return resampled_flatfield @ wavelength_matrix.T
+
+
+@lru_cache(maxsize=32)
+def _resample_stock_flatfield(
+        name: str, n_positions: int, wavelengths: tuple,
+        flatfield_wavelengths: tuple) -> np.ndarray:
+    flatfield = resample_flatfield(
+        _stock_flatfields[name](), n_positions,
+        None if wavelengths is None else np.array(wavelengths),
+        None if flatfield_wavelengths is None
+        else np.array(flatfield_wavelengths))
+    flatfield.flags.writeable = False
+    return flatfield
+
+
+def get_resampled_flatfield(
+        name: str, n_positions: int, wavelengths: np.ndarray = None,
+        flatfield_wavelengths: np.ndarray = None) -> np.ndarray:
+    """Get a stock flatfield resampled to a given binning.
+
+    Each binning is only resampled once per process; later calls return the
+    same read-only array.
+
+    Parameters
+    ----------
+    name: str
+        The name of the stock flatfield. This can be any of
+        :code:`'mid-hi-res-pipeline'`, :code:`'mid-hi-res-update'`,
+        :code:`'mid-hi-res-my34gds'`, :code:`'hi-res'`,
+        :code:`'mid-res-app-flip'`, or :code:`'mid-res-no-app-flip'`.
+    n_positions: int
+        The number of spatial positions to resample to.
+    wavelengths: np.ndarray
+        The wavelengths to resample to. If :code:`None`, the spectral axis is
+        left alone.
+    flatfield_wavelengths: np.ndarray
+        The wavelengths of each spectral bin of the flatfield.
+
+    Returns
+    -------
+    np.ndarray
+        The resampled flatfield.
+
+    Raises
+    ------
+    ValueError
+        Raised if :code:`name` is not a stock flatfield.
+
+    See Also
+    --------
+    resample_flatfield: Resample any flatfield.
+
+    Examples
+    --------
+    Get the mid-hi-resolution flatfield for a file with 50 positions.
+
+    >>> import pyuvs as pu
+    >>> flatfield = pu.get_resampled_flatfield('mid-hi-res-pipeline', 50)
+    >>> flatfield is pu.get_resampled_flatfield('mid-hi-res-pipeline', 50)
+    True
+
+    """
+    if name not in _stock_flatfields:
+        message = f'{name} is not a stock flatfield. Use one of ' \
+                  f'{list(_stock_flatfields)}.'
+        raise ValueError(message)
+    return _resample_stock_flatfield(
+        name, int(n_positions),
+        None if wavelengths is None else tuple(wavelengths),
+        None if flatfield_wavelengths is None
+        else tuple(flatfield_wavelengths))
+
+
+def get_matching_flatfield(n_positions: int, n_wavelengths: int) \
+        -> Union[np.ndarray, None]:
+    """Get the default stock flatfield for a detector image's binning.
+
+    The mid-hi-resolution pipeline flatfield is used for images with 19
+    spectral bins and the hi-resolution flatfield for images with 15 spectral
+    bins. Either is resampled to the image's number of positions.
+
+    Parameters
+    ----------
+    n_positions: int
+        The number of spatial positions of the detector image.
+    n_wavelengths: int
+        The number of spectral bins of the detector image.
+
+    Returns
+    -------
+    np.ndarray or None
+        The read-only resampled flatfield, or :code:`None` if no stock
+        flatfield has :code:`n_wavelengths` spectral bins.
+
+    See Also
+    --------
+    get_resampled_flatfield: Get any stock flatfield resampled to a binning.
+
+    Examples
+    --------
+    Get the flatfield of a mid-hi-resolution image, then try to get the
+    flatfield of an image with a spectral binning without a flatfield.
+
+    >>> import pyuvs as pu
+    >>> pu.get_matching_flatfield(50, 19).shape
+    (50, 19)
+    >>> pu.get_matching_flatfield(50, 20) is None
+    True
+
+    """
+    for name in _default_flatfields:
+        if _stock_flatfields[name]().shape[1] == n_wavelengths:
+            return get_resampled_flatfield(name, n_positions)
+    return None
+
+
+def apply_flatfield(detector_image: np.ndarray, flatfield: np.ndarray) \
+        -> np.ndarray:
+    """Divide a detector image by a flatfield in place.
+
+    Parameters
+    ----------
+    detector_image: np.ndarray
+        The detector image to correct. This is assumed to be 3-dimensional
+        with shape (n_integrations, n_positions, n_wavelengths) and have a
+        floating point dtype.
+    flatfield: np.ndarray
+        The flatfield. This must have shape (n_positions, n_wavelengths).
+
+    Returns
+    -------
+    np.ndarray
+        The input detector image, which has been modified in place.
+
+    Raises
+    ------
+    ValueError
+        Raised if the flatfield does not match the shape of the detector
+        image.
+
+    Examples
+    --------
+    Flatfield correct a detector image.
+
+    >>> import numpy as np
+    >>> import pyuvs as pu
+    >>> image = np.ones((10, 50, 19))
+    >>> flatfield = pu.get_resampled_flatfield('mid-hi-res-pipeline', 50)
+    >>> corrected = pu.apply_flatfield(image, flatfield)
+    >>> corrected is image
+    True
+
+    """
+    if detector_image.shape[-2:] != flatfield.shape:
+        message = f'The flatfield shape {flatfield.shape} does not match ' \
+                  f'the detector image shape {detector_image.shape}.'
+        raise ValueError(message)
+    return np.divide(detector_image, flatfield, out=detector_image)
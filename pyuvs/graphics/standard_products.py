@@ -2,6 +2,7 @@ from pathlib import Path
 import matplotlib.pyplot as plt
 import numpy as np
 from pyuvs.constants import angular_slit_width, minimum_mirror_angle, maximum_mirror_angle
+from pyuvs.flatfield import apply_flatfield, get_matching_flatfield
 from pyuvs.spectra import fit_muv_templates_to_nightside_data
 from pyuvs.swath import swath_number
 from pyuvs.utils import set_bad_pixels_to_nan
@@ -51,7 +52,9 @@ def make_dayside_segment_detector_image(orbit: int, data_location: Path, saveloc
         n_spatial_bins = primary.shape[1]
 
         if daynight:
-            # TODO: FF correct here
+            flatfield = get_matching_flatfield(*primary.shape[1:])
+            if flatfield is not None:
+                apply_flatfield(primary, flatfield)
             rgb_primary = histogram_equalize_detector_image(primary, mask=on_disk_mask) / 255
 
         for swath in np.unique(swath_numbers):
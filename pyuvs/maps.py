@@ -0,0 +1,221 @@
+"""This module provides functions to sample maps of Mars at arbitrary
+coordinates.
+"""
+import numpy as np
+from pyuvs.anc import load_map_magnetic_field_closed_probability, \
+    load_map_magnetic_field_open_probability, load_map_mars_surface
+
+
+def _get_fractional_indices(
+        map_shape: tuple, latitude: np.ndarray, longitude: np.ndarray,
+        latitude_increasing: bool) -> tuple[np.ndarray, np.ndarray]:
+    # The map values are assumed to be at the centers of equal-sized cells
+    n_latitudes, n_longitudes = map_shape[:2]
+    latitude_from_edge = latitude + 90 if latitude_increasing \
+        else 90 - latitude
+    rows = latitude_from_edge * n_latitudes / 180 - 0.5
+    columns = np.mod(longitude, 360) * n_longitudes / 360 - 0.5
+    return rows, columns
+
+
+def sample_map(
+        map_array: np.ndarray, latitude: np.ndarray, longitude: np.ndarray,
+        method: str = 'nearest', latitude_increasing: bool = True,
+        fill_value: float = np.nan) -> np.ndarray:
+    """Sample a latitude/longitude map at arbitrary coordinates.
+
+    Parameters
+    ----------
+    map_array: np.ndarray
+        The map to sample. The zeroth axis must correspond to latitude and span
+        -90 to 90 degrees (or 90 to -90 degrees); the first axis must
+        correspond to east longitude and span 0 to 360 degrees. Any additional
+        axes, such as color channels, are carried along.
+    latitude: np.ndarray
+        The latitudes [degrees] to sample. This can have any shape.
+    longitude: np.ndarray
+        The east longitudes [degrees] to sample. This must have the same
+        shape as :code:`latitude`. Longitudes wrap around, so any value is
+        allowed.
+    method: str
+        The sampling method. Either :code:`'nearest'` or
+        :code:`'bilinear'`.
+    latitude_increasing: bool
+        True if the zeroth axis of the map goes from -90 to 90 degrees; False
+        if it goes from 90 to -90 degrees.
+    fill_value: float
+        The value of the samples where the latitude or longitude is not
+        finite, such as off-disk pixels.
+
+    Returns
+    -------
+    np.ndarray
+        The sampled map. This has shape latitude.shape + map_array.shape[2:].
+
+    Raises
+    ------
+    ValueError
+        Raised if :code:`method` is not recognized.
+
+    Notes
+    -----
+    The map values are assumed to be at the centers of equal-sized cells.
+    Bilinear sampling wraps around in longitude and is clamped to the
+    outermost row of cells at the poles. Every sample is made with one
+    vectorized gather per cell corner, so whole orbits of pixel corners can be
+    sampled at once.
+
+    Examples
+    --------
+    Sample the closed magnetic field probability at the center of every
+    pixel of a fake observation.
+
+    >>> import numpy as np
+    >>> import pyuvs as pu
+    >>> b_field = pu.load_map_magnetic_field_closed_probability()
+    >>> latitude = np.linspace(-60, 60, num=200*50).reshape(200, 50)
+    >>> longitude = np.linspace(-30, 400, num=200*50).reshape(200, 50)
+    >>> pu.sample_map(b_field, latitude, longitude, method='bilinear').shape
+    (200, 50)
+
+    """
+    latitude = np.asarray(latitude, dtype=float)
+    longitude = np.asarray(longitude, dtype=float)
+    valid = np.isfinite(latitude) & np.isfinite(longitude)
+    latitude = np.where(valid, latitude, 0)
+    longitude = np.where(valid, longitude, 0)
+
+    n_latitudes, n_longitudes = map_array.shape[:2]
+    flat_map = map_array.reshape((n_latitudes * n_longitudes,) +
+                                 map_array.shape[2:])
+    rows, columns = _get_fractional_indices(
+        map_array.shape, latitude, longitude, latitude_increasing)
+
+    if method == 'nearest':
+        row = np.clip(np.floor(rows + 0.5).astype(int), 0, n_latitudes - 1)
+        column = np.mod(np.floor(columns + 0.5).astype(int), n_longitudes)
+        samples = flat_map[row * n_longitudes + column]
+    elif method == 'bilinear':
+        lower_row = np.floor(rows).astype(int)
+        left_column = np.floor(columns).astype(int)
+        row_fraction = rows - lower_row
+        column_fraction = columns - left_column
+
+        # Clamp at the poles but wrap around in longitude
+        lower_row, upper_row = np.clip(lower_row, 0, n_latitudes - 1), \
+            np.clip(lower_row + 1, 0, n_latitudes - 1)
+        left_column, right_column = np.mod(left_column, n_longitudes), \
+            np.mod(left_column + 1, n_longitudes)
+
+        extra_axes = (np.newaxis,) * (map_array.ndim - 2)
+        row_fraction = row_fraction[(...,) + extra_axes]
+        column_fraction = column_fraction[(...,) + extra_axes]
+        samples = \
+            (1 - row_fraction) * (1 - column_fraction) * \
+            flat_map[lower_row * n_longitudes + left_column] + \
+            (1 - row_fraction) * column_fraction * \
+            flat_map[lower_row * n_longitudes + right_column] + \
+            row_fraction * (1 - column_fraction) * \
+            flat_map[upper_row * n_longitudes + left_column] + \
+            row_fraction * column_fraction * \
+            flat_map[upper_row * n_longitudes + right_column]
+    else:
+        message = f'{method} is not a sampling method. Use either ' \
+                  f'\'nearest\' or \'bilinear\'.'
+        raise ValueError(message)
+
+    samples = samples.astype(np.result_type(samples, fill_value))
+    samples[~valid] = fill_value
+    return samples
+
+
+def sample_map_magnetic_field_closed_probability(
+        latitude: np.ndarray, longitude: np.ndarray,
+        method: str = 'nearest') -> np.ndarray:
+    """Sample the probability of a closed magnetic field line at arbitrary
+    coordinates.
+
+    Parameters
+    ----------
+    latitude: np.ndarray
+        The latitudes [degrees] to sample. This can have any shape.
+    longitude: np.ndarray
+        The east longitudes [degrees] to sample. This must have the same
+        shape as :code:`latitude`.
+    method: str
+        The sampling method. Either :code:`'nearest'` or
+        :code:`'bilinear'`.
+
+    Returns
+    -------
+    np.ndarray
+        The sampled probabilities.
+
+    See Also
+    --------
+    sample_map: Sample any map.
+
+    """
+    return sample_map(load_map_magnetic_field_closed_probability(), latitude,
+                      longitude, method=method)
+
+
+def sample_map_magnetic_field_open_probability(
+        latitude: np.ndarray, longitude: np.ndarray,
+        method: str = 'nearest') -> np.ndarray:
+    """Sample the probability of an open magnetic field line at arbitrary
+    coordinates.
+
+    Parameters
+    ----------
+    latitude: np.ndarray
+        The latitudes [degrees] to sample. This can have any shape.
+    longitude: np.ndarray
+        The east longitudes [degrees] to sample. This must have the same
+        shape as :code:`latitude`.
+    method: str
+        The sampling method. Either :code:`'nearest'` or
+        :code:`'bilinear'`.
+
+    Returns
+    -------
+    np.ndarray
+        The sampled probabilities.
+
+    See Also
+    --------
+    sample_map: Sample any map.
+
+    """
+    return sample_map(load_map_magnetic_field_open_probability(), latitude,
+                      longitude, method=method)
+
+
+def sample_map_mars_surface(
+        latitude: np.ndarray, longitude: np.ndarray,
+        method: str = 'nearest') -> np.ndarray:
+    """Sample the Mars surface map at arbitrary coordinates.
+
+    Parameters
+    ----------
+    latitude: np.ndarray
+        The latitudes [degrees] to sample. This can have any shape.
+    longitude: np.ndarray
+        The east longitudes [degrees] to sample. This must have the same
+        shape as :code:`latitude`.
+    method: str
+        The sampling method. Either :code:`'nearest'` or
+        :code:`'bilinear'`.
+
+    Returns
+    -------
+    np.ndarray
+        The sampled RGBA values. This has shape latitude.shape + (4,).
+
+    See Also
+    --------
+    sample_map: Sample any map.
+
+    """
+    return sample_map(load_map_mars_surface(), latitude, longitude,
+                      method=method, latitude_increasing=False)
@@ -0,0 +1,697 @@
+"""This module provides tools to solve many linear regressions at once.
+"""
+from functools import cached_property
+from itertools import product
+import numpy as np
+
+
+def _mask_invalid_samples(
+        data: np.ndarray, design: np.ndarray, weights: np.ndarray) \
+        -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # Non-finite samples are given zero weight so they drop out of the fit
+    valid = np.isfinite(data) & np.isfinite(weights) & \
+        np.all(np.isfinite(design), axis=-1)
+    data = np.where(valid, data, 0)
+    weights = np.where(valid, weights, 0)
+    design = np.where(np.isfinite(design), design, 0)
+    return data, design, weights, valid
+
+
+def _form_normal_equations(
+        data: np.ndarray, design: np.ndarray, weights: np.ndarray) \
+        -> tuple[np.ndarray, np.ndarray]:
+    n_samples, n_parameters = design.shape[-2:]
+    if design.ndim == 2:
+        # A shared design lets each batch of normal matrices be one matrix
+        # product of the weights with the outer products of the design rows
+        outer_products = np.einsum('wi,wj->wij', design, design)
+        normal_matrix = (weights @ outer_products.reshape(n_samples, -1))\
+            .reshape(weights.shape[:-1] + (n_parameters, n_parameters))
+        normal_vector = (weights * data) @ design
+    else:
+        normal_matrix = np.einsum('...wi,...w,...wj->...ij', design, weights,
+                                  design, optimize=True)
+        normal_vector = np.einsum('...wi,...w->...i', design, weights * data,
+                                  optimize=True)
+    return normal_matrix, normal_vector
+
+
+def _solve_normal_equations(
+        normal_matrix: np.ndarray, normal_vector: np.ndarray,
+        solvable: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # Scale the columns to unit diagonal (Jacobi preconditioning) so that
+    # parameters of very different magnitude do not ruin the conditioning
+    diagonal = np.diagonal(normal_matrix, axis1=-2, axis2=-1)
+    scale = 1 / np.sqrt(np.where(diagonal > 0, diagonal, 1))
+    scaled_matrix = normal_matrix * scale[..., :, np.newaxis] * \
+        scale[..., np.newaxis, :]
+    identity = np.eye(normal_matrix.shape[-1])
+    scaled_matrix = np.where(solvable[..., np.newaxis, np.newaxis],
+                             scaled_matrix, identity)
+    try:
+        scaled_inverse = np.linalg.inv(scaled_matrix)
+    except np.linalg.LinAlgError:
+        scaled_inverse = np.linalg.pinv(scaled_matrix, hermitian=True)
+    inverse = scaled_inverse * scale[..., :, np.newaxis] * \
+        scale[..., np.newaxis, :]
+    coefficients = np.einsum('...ij,...j->...i', inverse, normal_vector)
+    coefficients[~solvable] = np.nan
+    inverse[~solvable] = np.nan
+    return coefficients, inverse
+
+
+class SharedWeightsFactorization:
+    """The factorization of a design matrix and weights shared by many fits.
+
+    When many data sets share both their design matrix and their weights, the
+    weighted least squares solution is the same linear projection of each
+    data set. This precomputes that projection so whole cubes can be fit with
+    one matrix multiplication over the sample axis.
+
+    Parameters
+    ----------
+    design: np.ndarray
+        The design matrix. This array has shape (n_samples, n_parameters).
+    weights: np.ndarray
+        The weight of each sample. This array has shape (..., n_samples),
+        where any leading axes index different sets of shared weights (for
+        instance, one per integration). Samples with non-finite or zero
+        weight are dropped from the fits.
+
+    See Also
+    --------
+    WeightedLeastSquaresFit: Fit data using this factorization.
+
+    Examples
+    --------
+    Fit a line to 1000 spectra with uniform weights.
+
+    >>> import numpy as np
+    >>> import pyuvs as pu
+    >>> x = np.linspace(0, 1, num=50)
+    >>> design = np.column_stack([np.ones(50), x])
+    >>> factorization = pu.SharedWeightsFactorization(design, np.ones(50))
+    >>> factorization.projection.shape
+    (2, 50)
+    >>> data = 2 + 3 * x + np.zeros((1000, 1))
+    >>> fit = pu.WeightedLeastSquaresFit(data, design, np.ones(50),
+    ...                                  factorization=factorization)
+    >>> np.allclose(fit.coefficients, [2, 3])
+    True
+
+    """
+    def __init__(self, design: np.ndarray, weights: np.ndarray):
+        design = np.asarray(design, dtype=float)
+        weights = np.asarray(weights, dtype=float)
+        if weights.ndim == 0:
+            weights = np.full(design.shape[0], weights)
+        _, design, weights, valid = _mask_invalid_samples(
+            np.zeros(weights.shape), design, weights)
+        normal_matrix, normal_vector = _form_normal_equations(
+            np.zeros(weights.shape), design, weights)
+        self._valid = valid & (weights > 0)
+        solvable = np.sum(self._valid, axis=-1) >= design.shape[-1]
+        _, self._unscaled_covariance = _solve_normal_equations(
+            normal_matrix, normal_vector, solvable)
+        self._projection = self._unscaled_covariance @ \
+            (design.T * weights[..., np.newaxis, :])
+        for array in [self._valid, self._unscaled_covariance,
+                      self._projection]:
+            array.flags.writeable = False
+
+    @property
+    def projection(self) -> np.ndarray:
+        """Get the matrix that projects data onto the best fit coefficients.
+        This array has shape (..., n_parameters, n_samples).
+
+        """
+        return self._projection
+
+    @property
+    def unscaled_covariance(self) -> np.ndarray:
+        """Get the inverse of the weighted normal matrix. This array has shape
+        (..., n_parameters, n_parameters).
+
+        """
+        return self._unscaled_covariance
+
+    @property
+    def valid(self) -> np.ndarray:
+        """Get whether each sample is used in the fits.
+
+        """
+        return self._valid
+
+    def project(self, data: np.ndarray) -> np.ndarray:
+        """Project data onto the best fit coefficients.
+
+        Parameters
+        ----------
+        data: np.ndarray
+            The data to project. This array has shape (..., n_samples) and its
+            invalid samples must be zero.
+
+        Returns
+        -------
+        np.ndarray
+            The best fit coefficients of each data set.
+
+        """
+        if self._projection.ndim == 2:
+            return data @ self._projection.T
+        return np.einsum('...iw,...w->...i', self._projection, data)
+
+
+class WeightedLeastSquaresFit:
+    """Weighted linear least squares fits of many data sets at once.
+
+    The weighted normal equations of all fits are formed and solved together.
+    The goodness-of-fit statistics are computed in bulk from the same
+    solution when they are first accessed.
+
+    Parameters
+    ----------
+    data: np.ndarray
+        The data to fit. This array can have any shape; the last axis is the
+        axis of samples (for instance, wavelengths) and all other axes are
+        fit independently.
+    design: np.ndarray
+        The design matrix. This array has shape (n_samples, n_parameters) if
+        it is shared by all fits, or it must broadcast with :code:`data` to
+        shape data.shape + (n_parameters,).
+    weights: np.ndarray
+        The weight of each sample, usually 1 / uncertainty**2. This array must
+        broadcast with :code:`data`.
+    nonnegative: np.ndarray
+        A boolean array of shape (n_parameters,) that is True for each
+        parameter constrained to be non-negative. At most 8 parameters can be
+        constrained. If :code:`None`, no parameters are constrained.
+    factorization: SharedWeightsFactorization
+        The factorization of :code:`design` and :code:`weights`, which saves
+        refactoring them when many data sets are fit with the same design and
+        weights. If :code:`None`, it is made whenever the weights are shared
+        by many fits. It is not used by constrained fits.
+
+    Raises
+    ------
+    ValueError
+        Raised if more than 8 parameters are constrained to be non-negative.
+
+    Notes
+    -----
+    Samples where the data, the weights, or the design are not finite are
+    given zero weight, which is equivalent to dropping them from the fit.
+    This lets NaN-padded spectra be fit without removing their padding. Fits
+    with fewer valid samples than parameters are NaN.
+
+    If the design matrix is shared and the weights have fewer independent
+    sets than there are fits (for instance, uniform weights or weights shared
+    along the spatial axis), all fits are solved with one projection; see
+    :class:`SharedWeightsFactorization`. Fits with missing samples that the
+    shared weights do not drop are solved on their own.
+
+    Constrained fits are solved exactly by trying every active set of the
+    constrained parameters for all fits at once, which is fast for the
+    handful of parameters of template fits. There are 2**k active sets of k
+    constrained parameters, so k is limited to 8. Their covariance is that of
+    the unconstrained fit of the parameters off their bounds; the parameters
+    at a bound have zero variance.
+
+    The columns of each normal matrix are scaled to unit diagonal before
+    solving to keep them well conditioned.
+
+    The statistics follow the statsmodels WLS conventions: the covariance is
+    scaled by the reduced chi squared, and R squared is computed about the
+    weighted mean of the data.
+
+    See Also
+    --------
+    solve_weighted_least_squares: Only get the best fit coefficients.
+
+    Examples
+    --------
+    Fit a line to 1000 noisy spectra at once.
+
+    >>> import numpy as np
+    >>> import pyuvs as pu
+    >>> rng = np.random.default_rng(0)
+    >>> x = np.linspace(0, 1, num=50)
+    >>> design = np.column_stack([np.ones(50), x])
+    >>> data = 2 + 3 * x + rng.normal(size=(1000, 50))
+    >>> fit = pu.WeightedLeastSquaresFit(data, design, 1)
+    >>> fit.coefficients.shape, fit.standard_errors.shape
+    ((1000, 2), (1000, 2))
+    >>> bool(np.isclose(np.mean(fit.reduced_chi_squared), 1, atol=0.05))
+    True
+
+    """
+    def __init__(self, data: np.ndarray, design: np.ndarray,
+                 weights: np.ndarray, nonnegative: np.ndarray = None,
+                 factorization: SharedWeightsFactorization = None):
+        data = np.asarray(data, dtype=float)
+        design = np.asarray(design, dtype=float)
+        weights = np.asarray(weights, dtype=float)
+        self._set_samples(data, design, weights)
+
+        constrained = nonnegative is not None and np.any(nonnegative)
+        if constrained and \
+                np.sum(nonnegative) > _max_nonnegative_parameters:
+            message = f'At most {_max_nonnegative_parameters} parameters ' \
+                      f'can be constrained to be non-negative, not ' \
+                      f'{np.sum(nonnegative)}.'
+            raise ValueError(message)
+        if factorization is None and not constrained and design.ndim == 2 \
+                and np.prod(weights.shape[:-1], dtype=int) < \
+                np.prod(data.shape[:-1], dtype=int):
+            factorization = SharedWeightsFactorization(design, weights)
+        if factorization is not None and not constrained:
+            self._coefficients, self._unscaled_covariance = \
+                self._solve_with_factorization(factorization)
+            return
+
+        normal_matrix, normal_vector = _form_normal_equations(
+            self._data, self._design, self._weights)
+        solvable = np.broadcast_to(self._n_samples >= design.shape[-1],
+                                   normal_vector.shape[:-1])
+        if constrained:
+            self._coefficients, self._unscaled_covariance = \
+                _solve_nonnegative_normal_equations(
+                    normal_matrix, normal_vector, solvable,
+                    np.asarray(nonnegative, dtype=bool))
+        else:
+            self._coefficients, self._unscaled_covariance = \
+                _solve_normal_equations(normal_matrix, normal_vector,
+                                        solvable)
+
+    def _set_samples(self, data: np.ndarray, design: np.ndarray,
+                     weights: np.ndarray) -> None:
+        self._data, self._design, self._weights, valid = \
+            _mask_invalid_samples(data, design,
+                                  np.broadcast_to(weights, data.shape))
+        self._valid = valid & (self._weights > 0)
+        self._n_samples = np.sum(self._valid, axis=-1)
+
+    def _solve_with_factorization(
+            self, factorization: SharedWeightsFactorization) \
+            -> tuple[np.ndarray, np.ndarray]:
+        n_parameters = self._design.shape[-1]
+        coefficients = factorization.project(self._data)
+        unscaled_covariance = np.broadcast_to(
+            factorization.unscaled_covariance,
+            coefficients.shape + (n_parameters,))
+
+        # Fits with their own missing samples cannot use the shared projection
+        refit = np.any(self._valid != factorization.valid, axis=-1)
+        if np.any(refit):
+            unscaled_covariance = unscaled_covariance.copy()
+            normal_matrix, normal_vector = _form_normal_equations(
+                self._data[refit], self._design, self._weights[refit])
+            coefficients[refit], unscaled_covariance[refit] = \
+                _solve_normal_equations(
+                    normal_matrix, normal_vector,
+                    self._n_samples[refit] >= n_parameters)
+        return coefficients, unscaled_covariance
+
+    @property
+    def coefficients(self) -> np.ndarray:
+        """Get the best fit coefficients. This array has shape
+        data.shape[:-1] + (n_parameters,).
+
+        """
+        return self._coefficients
+
+    @cached_property
+    def residuals(self) -> np.ndarray:
+        """Get the residuals of the fits. Dropped samples are NaN.
+
+        """
+        model = _predict(self._design, self._coefficients)
+        return np.where(self._valid, self._data - model, np.nan)
+
+    @cached_property
+    def degrees_of_freedom(self) -> np.ndarray:
+        """Get the residual degrees of freedom of each fit.
+
+        """
+        return self._n_samples - self._design.shape[-1]
+
+    @cached_property
+    def reduced_chi_squared(self) -> np.ndarray:
+        """Get the weighted sum of squared residuals divided by the degrees of
+        freedom of each fit.
+
+        """
+        weighted_ssr = np.sum(
+            self._weights * np.where(self._valid, self.residuals, 0) ** 2,
+            axis=-1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.degrees_of_freedom > 0,
+                            weighted_ssr / self.degrees_of_freedom, np.nan)
+
+    @cached_property
+    def covariance(self) -> np.ndarray:
+        """Get the covariance matrix of the coefficients of each fit. This
+        array has shape data.shape[:-1] + (n_parameters, n_parameters).
+
+        """
+        return self._unscaled_covariance * \
+            self.reduced_chi_squared[..., np.newaxis, np.newaxis]
+
+    @cached_property
+    def standard_errors(self) -> np.ndarray:
+        """Get the standard errors of the coefficients.
+
+        """
+        return np.sqrt(np.diagonal(self.covariance, axis1=-2, axis2=-1))
+
+    @cached_property
+    def r_squared(self) -> np.ndarray:
+        """Get the coefficient of determination of each fit.
+
+        """
+        total_weight = np.sum(self._weights, axis=-1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.sum(self._weights * self._data, axis=-1,
+                          keepdims=True) / total_weight
+            weighted_tss = np.sum(self._weights * (self._data - mean) ** 2,
+                                  axis=-1)
+            weighted_ssr = np.sum(
+                self._weights * np.where(self._valid, self.residuals, 0) ** 2,
+                axis=-1)
+            return 1 - weighted_ssr / weighted_tss
+
+
+def _huber_weights(standardized_residuals: np.ndarray,
+                   tuning_constant: float) -> np.ndarray:
+    absolute = np.abs(standardized_residuals)
+    with np.errstate(divide='ignore'):
+        return np.where(absolute <= tuning_constant, 1,
+                        tuning_constant / absolute)
+
+
+def _tukey_weights(standardized_residuals: np.ndarray,
+                   tuning_constant: float) -> np.ndarray:
+    ratio = standardized_residuals / tuning_constant
+    return np.where(np.abs(ratio) <= 1, (1 - ratio ** 2) ** 2, 0)
+
+
+_robust_norms: dict = {'huber': (_huber_weights, 1.345),
+                       'tukey': (_tukey_weights, 4.685)}
+
+# The median absolute deviation of a standard normal distribution,
+# scipy.stats.norm.ppf(0.75), which turns a MAD into a standard deviation
+_normal_median_absolute_deviation: float = 0.6744897501960817
+
+
+def _nanmedian(array: np.ndarray) -> np.ndarray:
+    # np.nanmedian goes through masked arrays; sorting puts NaNs last so the
+    # median of each row can be picked from its valid values directly
+    array = np.sort(array, axis=-1)
+    n_valid = np.sum(~np.isnan(array), axis=-1, keepdims=True)
+    lower = np.take_along_axis(array, np.maximum(n_valid - 1, 0) // 2, -1)
+    upper = np.take_along_axis(array, n_valid // 2, -1)
+    return np.where(n_valid > 0, (lower + upper) / 2, np.nan)[..., 0]
+
+
+class RobustLeastSquaresFit(WeightedLeastSquaresFit):
+    """Robust linear least squares fits of many data sets at once.
+
+    The fits are M-estimates found by iteratively reweighted least squares
+    (IRLS). Every iteration refits all of the unconverged data sets at once,
+    and data sets drop out of later iterations as soon as they converge.
+
+    Parameters
+    ----------
+    data: np.ndarray
+        The data to fit. This array can have any shape; the last axis is the
+        axis of samples (for instance, wavelengths) and all other axes are
+        fit independently.
+    design: np.ndarray
+        The design matrix. This array has shape (n_samples, n_parameters) if
+        it is shared by all fits, or it must broadcast with :code:`data` to
+        shape data.shape + (n_parameters,).
+    weights: np.ndarray
+        The weight of each sample, usually 1 / uncertainty**2. This array must
+        broadcast with :code:`data`.
+    norm: str
+        The robust norm. Either :code:`'huber'` or :code:`'tukey'` (Tukey's
+        biweight).
+    tuning_constant: float
+        The tuning constant of the norm, in units of the residual scale. If
+        :code:`None`, the constant with 95% efficiency for normal errors is
+        used: 1.345 for Huber and 4.685 for Tukey.
+    max_iterations: int
+        The most reweighting iterations of any fit.
+    tolerance: float
+        The fits have converged once no coefficient changes by more than this
+        fraction of the largest coefficient in an iteration.
+    nonnegative: np.ndarray
+        A boolean array of shape (n_parameters,) that is True for each
+        parameter constrained to be non-negative. At most 8 parameters can be
+        constrained. If :code:`None`, no parameters are constrained.
+
+    Raises
+    ------
+    ValueError
+        Raised if :code:`norm` is not recognized or if more than 8 parameters
+        are constrained to be non-negative.
+
+    See Also
+    --------
+    WeightedLeastSquaresFit: Fit data without downweighting outliers.
+
+    Notes
+    -----
+    Each iteration standardizes the weighted residuals by their median
+    absolute deviation, turns them into robust weights with the norm, and
+    refits with the product of :code:`weights` and the robust weights. This
+    follows the statsmodels RLM conventions. The uncertainties and goodness
+    of fit are those of the final weighted fit.
+
+    Fits that do not converge within :code:`max_iterations` keep their last
+    coefficients and are flagged in :py:attr:`converged`. Fits with NaN
+    coefficients, such as those without enough valid samples, are also
+    flagged as not converged.
+
+    Examples
+    --------
+    Fit a line to 1000 spectra, each with a cosmic ray hit.
+
+    >>> import numpy as np
+    >>> import pyuvs as pu
+    >>> rng = np.random.default_rng(0)
+    >>> x = np.linspace(0, 1, num=50)
+    >>> design = np.column_stack([np.ones(50), x])
+    >>> data = 2 + 3 * x + rng.normal(scale=0.1, size=(1000, 50))
+    >>> data[:, 10] += 100
+    >>> fit = pu.RobustLeastSquaresFit(data, design, 1, norm='tukey')
+    >>> np.allclose(fit.coefficients, [2, 3], atol=0.2)
+    True
+    >>> bool(np.all(fit.converged))
+    True
+
+    """
+    def __init__(self, data: np.ndarray, design: np.ndarray,
+                 weights: np.ndarray, norm: str = 'huber',
+                 tuning_constant: float = None, max_iterations: int = 50,
+                 tolerance: float = 1e-8, nonnegative: np.ndarray = None):
+        if norm not in _robust_norms:
+            message = f'{norm} is not a robust norm. Use either \'huber\' ' \
+                      f'or \'tukey\'.'
+            raise ValueError(message)
+        robust_weight_function, default_tuning_constant = _robust_norms[norm]
+        if tuning_constant is None:
+            tuning_constant = default_tuning_constant
+
+        data = np.asarray(data, dtype=float)
+        design = np.asarray(design, dtype=float)
+        weights = np.broadcast_to(np.asarray(weights, dtype=float),
+                                  data.shape)
+
+        # Iterate over a flat list of fits so subsets of them can be refit
+        n_samples = data.shape[-1]
+        flat_data = data.reshape(-1, n_samples)
+        flat_weights = weights.reshape(-1, n_samples)
+        flat_design = design if design.ndim == 2 else np.broadcast_to(
+            design, data.shape + design.shape[-1:])\
+            .reshape(-1, n_samples, design.shape[-1])
+        fit = WeightedLeastSquaresFit(flat_data, flat_design, flat_weights,
+                                      nonnegative)
+        coefficients = fit.coefficients
+        unscaled_covariance = np.array(fit._unscaled_covariance)
+        residuals = fit.residuals * np.sqrt(flat_weights)
+        robust_weights = np.ones(flat_data.shape)
+        n_iterations = np.zeros(flat_data.shape[0], dtype=int)
+        # Failed fits are finished but are not reported as converged
+        converged = np.any(np.isnan(coefficients), axis=-1)
+
+        for _ in range(max_iterations):
+            # Perfect fits have no scale and are already converged
+            active = np.flatnonzero(~converged)
+            scale = _nanmedian(np.abs(residuals[active])) / \
+                _normal_median_absolute_deviation
+            converged[active[~(scale > 0)]] = True
+            scale = scale[scale > 0]
+            active = np.flatnonzero(~converged)
+            if active.shape[0] == 0:
+                break
+
+            robust_weights[active] = robust_weight_function(
+                np.nan_to_num(residuals[active] / scale[:, np.newaxis]),
+                tuning_constant)
+            active_design = flat_design if design.ndim == 2 \
+                else flat_design[active]
+            fit = WeightedLeastSquaresFit(
+                flat_data[active], active_design,
+                flat_weights[active] * robust_weights[active], nonnegative)
+            change = np.max(np.abs(fit.coefficients - coefficients[active]),
+                            axis=-1)
+            coefficients[active] = fit.coefficients
+            unscaled_covariance[active] = fit._unscaled_covariance
+            # Samples with no robust weight still need their residuals
+            residuals[active] = \
+                (flat_data[active] -
+                 _predict(active_design, fit.coefficients)) * \
+                np.sqrt(flat_weights[active])
+            n_iterations[active] += 1
+            converged[active] = ~(change > tolerance * np.max(
+                np.abs(fit.coefficients), axis=-1))
+
+        robust_weights = robust_weights.reshape(data.shape)
+        n_iterations = n_iterations.reshape(data.shape[:-1])
+        converged = (converged & ~np.any(np.isnan(coefficients), axis=-1))\
+            .reshape(data.shape[:-1])
+        self._robust_weights = robust_weights
+        self._n_iterations = n_iterations
+        self._converged = converged
+
+        # The last fit of each data set is already the final weighted fit
+        self._set_samples(data, design, weights * robust_weights)
+        self._coefficients = coefficients.reshape(data.shape[:-1] + (-1,))
+        self._unscaled_covariance = unscaled_covariance.reshape(
+            data.shape[:-1] + unscaled_covariance.shape[-2:])
+
+    @property
+    def robust_weights(self) -> np.ndarray:
+        """Get the robust weight of each sample in the final fit. Outliers
+        have weights near 0.
+
+        """
+        return self._robust_weights
+
+    @property
+    def n_iterations(self) -> np.ndarray:
+        """Get the number of reweighting iterations of each fit.
+
+        """
+        return self._n_iterations
+
+    @property
+    def converged(self) -> np.ndarray:
+        """Get whether each fit converged.
+
+        """
+        return self._converged
+
+
+def _predict(design: np.ndarray, coefficients: np.ndarray) -> np.ndarray:
+    if design.ndim == 2:
+        return coefficients @ design.T
+    return np.einsum('...wi,...i->...w', design, coefficients)
+
+
+# Constrained fits try all 2**k active sets, so k must stay small
+_max_nonnegative_parameters: int = 8
+
+
+def _solve_nonnegative_normal_equations(
+        normal_matrix: np.ndarray, normal_vector: np.ndarray,
+        solvable: np.ndarray, nonnegative: np.ndarray) \
+        -> tuple[np.ndarray, np.ndarray]:
+    # The fits only have a handful of parameters, so every active set can be
+    # tried for all fits at once. The constrained optimum is the feasible
+    # candidate that reduces the weighted sum of squared residuals the most.
+    constrained = np.flatnonzero(nonnegative)
+    best_reduction = np.full(normal_vector.shape[:-1], -np.inf)
+    best_coefficients = np.full(normal_vector.shape, np.nan)
+    best_inverse = np.full(normal_matrix.shape, np.nan)
+    for is_free in product([False, True], repeat=constrained.shape[0]):
+        free = ~nonnegative
+        free[constrained[list(is_free)]] = True
+        indices = np.flatnonzero(free)
+        coefficients = np.zeros(normal_vector.shape)
+        inverse = np.zeros(normal_matrix.shape)
+        if indices.shape[0] > 0:
+            free_coefficients, free_inverse = _solve_normal_equations(
+                normal_matrix[..., indices[:, np.newaxis], indices],
+                normal_vector[..., indices], solvable)
+            coefficients[..., indices] = free_coefficients
+            inverse[..., indices[:, np.newaxis], indices] = free_inverse
+        feasible = np.all(coefficients[..., constrained] >= 0, axis=-1)
+        reduction = np.sum(coefficients * normal_vector, axis=-1)
+        better = feasible & (reduction > best_reduction)
+        best_reduction = np.where(better, reduction, best_reduction)
+        best_coefficients[better] = coefficients[better]
+        best_inverse[better] = inverse[better]
+    best_coefficients[~solvable] = np.nan
+    best_inverse[~solvable] = np.nan
+    return best_coefficients, best_inverse
+
+
+def solve_weighted_least_squares(
+        data: np.ndarray, design: np.ndarray, weights: np.ndarray) \
+        -> np.ndarray:
+    """Solve many weighted linear least squares problems at once.
+
+    Parameters
+    ----------
+    data: np.ndarray
+        The data to fit. This array can have any shape; the last axis is the
+        axis of samples (for instance, wavelengths) and all other axes are
+        fit independently.
+    design: np.ndarray
+        The design matrix. This array has shape (n_samples, n_parameters) if
+        it is shared by all fits, or it must broadcast with :code:`data` to
+        shape data.shape + (n_parameters,).
+    weights: np.ndarray
+        The weight of each sample, usually 1 / uncertainty**2. This array must
+        broadcast with :code:`data`.
+
+    Returns
+    -------
+    np.ndarray
+        The best fit coefficients. This array has shape
+        data.shape[:-1] + (n_parameters,). Fits with fewer valid samples than
+        parameters are NaN.
+
+    See Also
+    --------
+    WeightedLeastSquaresFit: Also get the uncertainties and goodness of fit.
+
+    Notes
+    -----
+    Samples where the data, the weights, or the design are not finite are
+    given zero weight, which is equivalent to dropping them from the fit.
+    This lets NaN-padded spectra be fit without removing their padding.
+
+    All the weighted normal equations are formed with array operations and
+    solved together. The columns of each normal matrix are scaled to unit
+    diagonal before solving to keep them well conditioned.
+
+    Examples
+    --------
+    Fit a line to 1000 noisy spectra at once.
+
+    >>> import numpy as np
+    >>> import pyuvs as pu
+    >>> x = np.linspace(0, 1, num=50)
+    >>> design = np.column_stack([np.ones(50), x])
+    >>> data = 2 + 3 * x + np.zeros((1000, 1))
+    >>> coefficients = pu.solve_weighted_least_squares(data, design, 1)
+    >>> coefficients.shape
+    (1000, 2)
+    >>> np.allclose(coefficients, [2, 3])
+    True
+
+    """
+    return WeightedLeastSquaresFit(data, design, weights).coefficients
@@ -1,11 +1,23 @@
 """This module provides functions to work with spectra.
 """
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from hashlib import sha1
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Iterable, Iterator, Union
 import numpy as np
 import statsmodels.api as sm
-from pyuvs import kR, load_muv_sensitivity_curve_observational, \
-    load_muv_wavelength_centers, load_template_co_cameron, \
+from pyuvs.anc import load_muv_point_spread_function, \
+    load_muv_sensitivity_curve_observational, \
+    load_muv_wavelength_centers, load_muv_wavelength_edges, \
+    load_template_co_cameron, \
     load_template_co2_plus_uvd, load_template_no_nightglow, \
-    load_template_solar_continuum, pixel_omega
+    load_template_solar_continuum
+from pyuvs.binning import rebin_pixels
+from pyuvs.constants import cmos_pixel_well_depth, kR, pixel_omega
+from pyuvs.regression import RobustLeastSquaresFit, \
+    SharedWeightsFactorization, WeightedLeastSquaresFit
 
 
 def load_standard_fit_templates() -> np.ndarray:
@@ -36,6 +48,13 @@ def load_standard_fit_templates() -> np.ndarray:
                       load_template_solar_continuum()])
 
 
+def _make_uniform_binning(n_pixels: int, pixels_per_bin: int) \
+        -> tuple[np.ndarray, np.ndarray]:
+    # Bins that would run past the last pixel make rebin_pixels raise
+    low = np.arange(0, n_pixels, pixels_per_bin)
+    return low, low + pixels_per_bin - 1
+
+
 def rebin_templates(template: np.ndarray, spectral_pixel_bin_width: int) \
         -> np.ndarray:
     """Rebin N spectral templates to match a given spectral bin width.
@@ -53,6 +72,10 @@ def rebin_templates(template: np.ndarray, spectral_pixel_bin_width: int) \
     np.ndarray
         Rebinned spectral template.
 
+    See Also
+    --------
+    rebin_pixels: Rebin to an arbitrary binning table.
+
     Examples
     --------
     Rebin the NO nightglow template to use the 256 spectral bin scheme. This
@@ -65,11 +88,9 @@ def rebin_templates(template: np.ndarray, spectral_pixel_bin_width: int) \
     (1, 256)
 
     """
-    new_shape = (template.shape[0],
-                 template.shape[1]//spectral_pixel_bin_width,
-                 spectral_pixel_bin_width)
-    reshaped_templates = np.reshape(template, new_shape)
-    return np.sum(reshaped_templates, axis=-1)
+    low, high = _make_uniform_binning(template.shape[-1],
+                                      spectral_pixel_bin_width)
+    return rebin_pixels(template, low, high)
 
 
 def pad_spectral_image_with_nan(
@@ -83,8 +104,9 @@ def pad_spectral_image_with_nan(
     Parameters
     ----------
     image: np.ndarray
-        The image to pad with NaNs. This is assumed to be 3-dimensional with
-        the last axis corresponding to wavelength.
+        The image to pad with NaNs. This is usually 3-dimensional, but can
+        have any number of leading axes; the last axis must correspond to
+        wavelength.
     n_wavelengths: int
         The number of wavelengths IUVS took data with.
     starting_spectral_index: int
@@ -119,8 +141,7 @@ def pad_spectral_image_with_nan(
     (nan, 1.0)
 
     """
-    temp_array = np.full((image.shape[0], image.shape[1], n_wavelengths),
-                         np.nan)
+    temp_array = np.full(image.shape[:-1] + (n_wavelengths,), np.nan)
     temp_array[..., starting_spectral_index:
                     starting_spectral_index+image.shape[-1]] = image
     return temp_array
@@ -146,6 +167,7 @@ def rebin_wavelengths(
     --------
     rebin_muv_wavelengths: Identical to this function but with pre-populated
                            MUV wavelengths.
+    rebin_pixels: Rebin to an arbitrary binning table.
 
     Examples
     --------
@@ -158,9 +180,9 @@ def rebin_wavelengths(
     (512,)
 
     """
-    new_shape = (wavelengths.shape[0]//spectral_pixel_bin_width,
-                 spectral_pixel_bin_width)
-    return wavelengths.reshape(new_shape).mean(axis=1)
+    low, high = _make_uniform_binning(wavelengths.shape[-1],
+                                      spectral_pixel_bin_width)
+    return rebin_pixels(wavelengths, low, high, average=True)
 
 
 def rebin_muv_wavelengths(spectral_pixel_bin_width: int) -> np.ndarray:
@@ -194,6 +216,267 @@ def rebin_muv_wavelengths(spectral_pixel_bin_width: int) -> np.ndarray:
                              spectral_pixel_bin_width)
 
 
+class SpectralScheme:
+    """A data structure of the MUV products of a spectral binning scheme.
+
+    IUVS only uses a handful of spectral binning schemes, so the rebinned
+    templates, wavelengths, and sensitivity curve are best computed once per
+    scheme and reused for every file taken with that scheme. All arrays span
+    the full scheme, as if IUVS transmitted every spectral bin, and are
+    read-only.
+
+    Parameters
+    ----------
+    pixels_per_spectral_bin: int
+        The number of detector pixels in each spectral bin.
+    starting_spectral_index: int
+        The index of the first transmitted spectral bin.
+    n_transmitted: int
+        The number of transmitted spectral bins.
+    cache_directory: Path
+        The directory where the products are saved to and loaded from. If
+        :code:`None`, the products are always computed.
+
+    Raises
+    ------
+    ValueError
+        Raised if the transmitted bins do not fit within the scheme.
+
+    See Also
+    --------
+    get_spectral_scheme: Get a memoized spectral scheme.
+
+    Examples
+    --------
+    Make the scheme with 4 pixels / spectral bin that transmitted 40 bins
+    starting at bin 60.
+
+    >>> import pyuvs as pu
+    >>> scheme = pu.SpectralScheme(4, 60, 40)
+    >>> scheme.templates.shape, scheme.wavelength_centers.shape
+    ((4, 256), (256,))
+    >>> scheme.transmitted
+    slice(60, 100, None)
+
+    """
+    def __init__(self, pixels_per_spectral_bin: int,
+                 starting_spectral_index: int, n_transmitted: int,
+                 cache_directory: Path = None):
+        self._pixels_per_spectral_bin = int(pixels_per_spectral_bin)
+        self._starting_spectral_index = int(starting_spectral_index)
+        self._n_transmitted = int(n_transmitted)
+        self._raise_value_error_if_transmitted_bins_are_outside_scheme()
+
+        products = self._load_or_compute_products(cache_directory)
+        for product in products.values():
+            product.flags.writeable = False
+        self._templates = products['templates']
+        self._wavelength_centers = products['wavelength_centers']
+        self._wavelength_widths = products['wavelength_widths']
+        self._sensitivity_curve = products['sensitivity_curve']
+
+    def _raise_value_error_if_transmitted_bins_are_outside_scheme(self):
+        if self._starting_spectral_index < 0 or self._n_transmitted < 1 or \
+                self._starting_spectral_index + self._n_transmitted > \
+                self.n_spectral_bins:
+            message = f'The {self._n_transmitted} transmitted bins starting ' \
+                      f'at {self._starting_spectral_index} do not fit in a ' \
+                      f'scheme of {self.n_spectral_bins} bins.'
+            raise ValueError(message)
+
+    def _load_or_compute_products(self, cache_directory: Path) \
+            -> dict[str, np.ndarray]:
+        if cache_directory is None:
+            return self._compute_products()
+        file_path = Path(cache_directory) / \
+            f'spectral-scheme-{self._pixels_per_spectral_bin}-' \
+            f'{self._starting_spectral_index}-{self._n_transmitted}.npz'
+        if file_path.exists():
+            with np.load(file_path) as products:
+                return dict(products)
+        products = self._compute_products()
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(file_path, **products)
+        return products
+
+    def _compute_products(self) -> dict[str, np.ndarray]:
+        wavelength_centers = \
+            rebin_muv_wavelengths(self._pixels_per_spectral_bin)
+        sensitivity = load_muv_sensitivity_curve_observational()
+        return {
+            'templates': rebin_templates(load_standard_fit_templates(),
+                                         self._pixels_per_spectral_bin),
+            'wavelength_centers': wavelength_centers,
+            'wavelength_widths': np.diff(
+                load_muv_wavelength_edges()[::self._pixels_per_spectral_bin]),
+            'sensitivity_curve': np.interp(wavelength_centers,
+                                           sensitivity[:, 0],
+                                           sensitivity[:, 1])}
+
+    @property
+    def pixels_per_spectral_bin(self) -> int:
+        """Get the number of detector pixels in each spectral bin.
+
+        """
+        return self._pixels_per_spectral_bin
+
+    @property
+    def starting_spectral_index(self) -> int:
+        """Get the index of the first transmitted spectral bin.
+
+        """
+        return self._starting_spectral_index
+
+    @property
+    def n_transmitted(self) -> int:
+        """Get the number of transmitted spectral bins.
+
+        """
+        return self._n_transmitted
+
+    @property
+    def n_spectral_bins(self) -> int:
+        """Get the number of spectral bins in the full scheme.
+
+        """
+        return 1024 // self._pixels_per_spectral_bin
+
+    @property
+    def transmitted(self) -> slice:
+        """Get the slice of the full scheme that IUVS transmitted.
+
+        """
+        return slice(self._starting_spectral_index,
+                     self._starting_spectral_index + self._n_transmitted)
+
+    @property
+    def templates(self) -> np.ndarray:
+        """Get the rebinned standard fit templates.
+
+        This array has shape (4, n_spectral_bins). See
+        :func:`load_standard_fit_templates` for the order of the templates.
+
+        """
+        return self._templates
+
+    @property
+    def wavelength_centers(self) -> np.ndarray:
+        """Get the rebinned MUV wavelength centers [nm].
+
+        """
+        return self._wavelength_centers
+
+    @property
+    def wavelength_widths(self) -> np.ndarray:
+        """Get the widths [nm] of the rebinned MUV wavelengths.
+
+        """
+        return self._wavelength_widths
+
+    @property
+    def sensitivity_curve(self) -> np.ndarray:
+        """Get the observational MUV sensitivity curve interpolated to the
+        rebinned wavelength centers.
+
+        """
+        return self._sensitivity_curve
+
+
+@lru_cache(maxsize=16)
+def get_spectral_scheme(pixels_per_spectral_bin: int,
+                        starting_spectral_index: int, n_transmitted: int,
+                        cache_directory: Path = None) -> SpectralScheme:
+    """Get the MUV products of a spectral binning scheme.
+
+    Each scheme is only computed once per process; later calls with the same
+    inputs return the same object.
+
+    Parameters
+    ----------
+    pixels_per_spectral_bin: int
+        The number of detector pixels in each spectral bin.
+    starting_spectral_index: int
+        The index of the first transmitted spectral bin.
+    n_transmitted: int
+        The number of transmitted spectral bins.
+    cache_directory: Path
+        The directory where the products are persisted between processes. If
+        :code:`None`, they are only kept in memory.
+
+    Returns
+    -------
+    SpectralScheme
+        The products of the spectral scheme.
+
+    Notes
+    -----
+    Persisted products are not recomputed if the ancillary templates or
+    sensitivity curve change, so clear :code:`cache_directory` when updating
+    pyuvs.
+
+    Examples
+    --------
+    Repeated calls return the same scheme.
+
+    >>> import pyuvs as pu
+    >>> scheme = pu.get_spectral_scheme(4, 60, 40)
+    >>> scheme is pu.get_spectral_scheme(4, 60, 40)
+    True
+
+    """
+    return SpectralScheme(pixels_per_spectral_bin, starting_spectral_index,
+                          n_transmitted, cache_directory)
+
+
+def get_binning_spectral_scheme(binning) -> SpectralScheme:
+    """Get the spectral scheme of a file's binning.
+
+    Parameters
+    ----------
+    binning
+        The binning of an l1b file, such as
+        :class:`~pyuvs.datafiles.L1bFile.Binning`.
+
+    Returns
+    -------
+    SpectralScheme
+        The memoized products of the file's spectral scheme.
+
+    Raises
+    ------
+    ValueError
+        Raised if the transmitted bins do not all have the same width, are not
+        contiguous, or do not start on a bin boundary of the scheme.
+
+    See Also
+    --------
+    get_spectral_scheme: Get a spectral scheme from its parameters.
+
+    Notes
+    -----
+    The scheme is found from the first and last detector pixels of each
+    spectral bin. Following the pipeline convention, the first and last bins
+    are the keyhole bins and every other bin is transmitted.
+
+    """
+    low = np.asarray(binning.spectral_pixel_low)
+    high = np.asarray(binning.spectral_pixel_high)
+    low = low.reshape(-1, low.shape[-1])[0, 1:-1].astype(int)
+    high = high.reshape(-1, high.shape[-1])[0, 1:-1].astype(int)
+    widths = high - low + 1
+    if widths.shape[0] == 0 or np.any(widths != widths[0]) or \
+            widths[0] < 1 or np.any(low[1:] != high[:-1] + 1) or \
+            low[0] % widths[0] != 0:
+        message = 'The transmitted spectral bins are not a spectral scheme. ' \
+                  'They must be contiguous, have the same width, and start ' \
+                  'on a multiple of that width.'
+        raise ValueError(message)
+    pixels_per_spectral_bin = int(widths[0])
+    return get_spectral_scheme(
+        pixels_per_spectral_bin, int(low[0]) // pixels_per_spectral_bin,
+        widths.shape[0])
+
+
 def calculate_calibration_curve(
         detector_sensitivity_curve: np.ndarray, spatial_bin_width: int,
         wavelength_width: np.ndarray, voltage_gain: float,
@@ -264,12 +547,675 @@ def calculate_muv_observational_calibration_curve(
         integration_time)
 
 
+@lru_cache(maxsize=32)
+def _make_muv_calibration_curve(
+        pixels_per_spatial_bin: int, pixels_per_spectral_bin: int,
+        starting_spectral_index: int, n_transmitted: int,
+        voltage_gain: float, integration_time: float, wavelengths: bytes,
+        wavelengths_shape: tuple, wavelength_width: bytes,
+        wavelength_width_shape: tuple, dtype: str) -> np.ndarray:
+    scheme = get_spectral_scheme(pixels_per_spectral_bin,
+                                 starting_spectral_index, n_transmitted)
+    if wavelengths is None:
+        sensitivity_curve = scheme.sensitivity_curve
+    else:
+        # np.interp takes any shape of points, so every position is
+        # interpolated at its own wavelengths in one call
+        sensitivity = load_muv_sensitivity_curve_observational()
+        sensitivity_curve = np.interp(
+            np.frombuffer(wavelengths).reshape(wavelengths_shape),
+            sensitivity[:, 0], sensitivity[:, 1])
+    wavelength_width = scheme.wavelength_widths if wavelength_width is None \
+        else np.frombuffer(wavelength_width).reshape(wavelength_width_shape)
+    curve = calculate_calibration_curve(
+        sensitivity_curve, pixels_per_spatial_bin, wavelength_width,
+        voltage_gain, integration_time)
+    curve = curve.astype(dtype)
+    curve.flags.writeable = False
+    return curve
+
+
+def get_muv_calibration_curve(
+        pixels_per_spatial_bin: int, pixels_per_spectral_bin: int,
+        starting_spectral_index: int, n_transmitted: int,
+        voltage_gain: float, integration_time: float,
+        wavelengths: np.ndarray = None, wavelength_width: np.ndarray = None,
+        dtype: str = 'float64') -> np.ndarray:
+    """Get the MUV calibration curve [DN/kR] of a set of instrument settings.
+
+    Only a handful of instrument settings are used throughout the mission, so
+    the curve of each set of settings is only computed once per process; later
+    calls return the same read-only array. The least recently used curves are
+    discarded once 32 are cached.
+
+    Parameters
+    ----------
+    pixels_per_spatial_bin: int
+        The number of detector pixels in each spatial bin.
+    pixels_per_spectral_bin: int
+        The number of detector pixels in each spectral bin.
+    starting_spectral_index: int
+        The index of the first transmitted spectral bin.
+    n_transmitted: int
+        The number of transmitted spectral bins.
+    voltage_gain: float
+        The voltage gain [V].
+    integration_time: float
+        The integration time.
+    wavelengths: np.ndarray
+        The wavelength centers of each spectral bin of each spatial position.
+        This can have any shape whose last axis has the scheme's
+        n_spectral_bins, such as (n_positions, n_spectral_bins). If
+        :code:`None`, the scheme's wavelength centers are used.
+    wavelength_width: np.ndarray
+        The wavelength width of each spectral bin, or one width for all of
+        them, like a file's median wavelength width. It must broadcast with
+        the curve. If :code:`None`, the scheme's wavelength widths are used.
+    dtype: str
+        The dtype of the curve.
+
+    Returns
+    -------
+    np.ndarray
+        The calibration curve. This array has shape (n_spectral_bins,), or the
+        shape of :code:`wavelengths` if it is provided, and spans the full
+        spectral scheme, like the products of :class:`SpectralScheme`.
+
+    Raises
+    ------
+    ValueError
+        Raised if the last axis of :code:`wavelengths` does not match the
+        number of spectral bins in the scheme.
+
+    See Also
+    --------
+    calculate_muv_observational_calibration_curve: Calculate the calibration
+                                                   curve from any wavelength
+                                                   widths.
+
+    Notes
+    -----
+    The sensitivity curve is interpolated to each position's own wavelengths.
+    Curves made from :code:`wavelengths` or :code:`wavelength_width` are
+    cached by their values.
+
+    Examples
+    --------
+    Get the calibration curve of each position of a file with 50 positions.
+
+    >>> import numpy as np
+    >>> import pyuvs as pu
+    >>> scheme = pu.get_spectral_scheme(4, 20, 200)
+    >>> wavelengths = np.tile(scheme.wavelength_centers, (50, 1))
+    >>> curve = pu.get_muv_calibration_curve(4, 4, 20, 200, 700, 4.8,
+    ...                                      wavelengths, dtype='float32')
+    >>> curve.shape, curve.dtype
+    ((50, 256), dtype('float32'))
+    >>> curve is pu.get_muv_calibration_curve(4, 4, 20, 200, 700, 4.8,
+    ...                                       wavelengths, dtype='float32')
+    True
+
+    """
+    wavelengths_shape = None
+    if wavelengths is not None:
+        wavelengths = np.ascontiguousarray(wavelengths, dtype=float)
+        n_spectral_bins = get_spectral_scheme(
+            int(pixels_per_spectral_bin), int(starting_spectral_index),
+            int(n_transmitted)).n_spectral_bins
+        if wavelengths.shape[-1] != n_spectral_bins:
+            message = f'The wavelengths have {wavelengths.shape[-1]} ' \
+                      f'spectral bins but the scheme has {n_spectral_bins}.'
+            raise ValueError(message)
+        wavelengths_shape = wavelengths.shape
+        wavelengths = wavelengths.tobytes()
+    wavelength_width_shape = None
+    if wavelength_width is not None:
+        wavelength_width = np.ascontiguousarray(wavelength_width, dtype=float)
+        wavelength_width_shape = wavelength_width.shape
+        wavelength_width = wavelength_width.tobytes()
+    return _make_muv_calibration_curve(
+        int(pixels_per_spatial_bin), int(pixels_per_spectral_bin),
+        int(starting_spectral_index), int(n_transmitted), float(voltage_gain),
+        float(integration_time), wavelengths, wavelengths_shape,
+        wavelength_width, wavelength_width_shape, np.dtype(dtype).str)
+
+
+def convolve_templates(templates: np.ndarray,
+                       point_spread_function: np.ndarray = None) \
+        -> np.ndarray:
+    """Convolve templates with a point spread function.
+
+    Parameters
+    ----------
+    templates: np.ndarray
+        The templates to convolve. The last axis must correspond to detector
+        pixels; all other axes are convolved at once.
+    point_spread_function: np.ndarray
+        The 1-dimensional point spread function, centered on its middle
+        element. If :code:`None`, the MUV point spread function is used.
+
+    Returns
+    -------
+    np.ndarray
+        The convolved templates. This array has the same shape as
+        :code:`templates`.
+
+    See Also
+    --------
+    get_psf_convolved_templates: Get memoized, rebinned convolved templates.
+
+    Notes
+    -----
+    The point spread function is normalized to sum to 1 so the convolution
+    conserves the total of each template, except for what is spread off the
+    detector; the templates are assumed to be 0 off the detector. All of the
+    templates are convolved at once with FFTs.
+
+    Examples
+    --------
+    Convolve the standard fit templates with the MUV point spread function.
+
+    >>> import numpy as np
+    >>> import pyuvs as pu
+    >>> templates = pu.load_standard_fit_templates()
+    >>> convolved = pu.convolve_templates(templates)
+    >>> convolved.shape
+    (4, 1024)
+    >>> np.allclose(np.sum(convolved, axis=-1), np.sum(templates, axis=-1),
+    ...             rtol=1e-3)
+    True
+
+    """
+    if point_spread_function is None:
+        point_spread_function = load_muv_point_spread_function()
+    kernel = np.asarray(point_spread_function, dtype=float)
+    kernel = kernel / np.sum(kernel)
+    templates = np.asarray(templates, dtype=float)
+    n_pixels = templates.shape[-1]
+
+    # Zero pad to the full convolution so the FFT does not wrap around, then
+    # keep the part aligned with the center of the kernel
+    n_fft = n_pixels + kernel.shape[0] - 1
+    convolution = np.fft.irfft(np.fft.rfft(templates, n=n_fft) *
+                               np.fft.rfft(kernel, n=n_fft), n=n_fft)
+    start = kernel.shape[0] // 2
+    return convolution[..., start:start + n_pixels]
+
+
+def get_psf_convolved_templates(
+        pixels_per_spectral_bin: int, templates: np.ndarray = None,
+        cache_directory: Path = None) -> np.ndarray:
+    """Get templates convolved with the MUV point spread function and rebinned
+    to a spectral scheme.
+
+    Each template set is only convolved once per process and spectral scheme;
+    later calls with the same inputs return the same read-only array. The
+    least recently used templates are discarded once 16 are cached.
+
+    Parameters
+    ----------
+    pixels_per_spectral_bin: int
+        The number of detector pixels in each spectral bin.
+    templates: np.ndarray
+        The templates to convolve. This must have shape (n_templates, 1024).
+        If :code:`None`, the standard fit templates are used.
+    cache_directory: Path
+        The directory where the convolved templates are persisted between
+        processes. If :code:`None`, they are only kept in memory.
+
+    Returns
+    -------
+    np.ndarray
+        The convolved templates with shape (n_templates, n_spectral_bins).
+
+    See Also
+    --------
+    convolve_templates: Convolve any templates with any point spread function.
+
+    Notes
+    -----
+    The template sets are identified by a hash of their values, so equal
+    arrays share their convolved templates. The files in
+    :code:`cache_directory` do not notice when the point spread function
+    changes, so clear it when updating pyuvs.
+
+    Examples
+    --------
+    Get the convolved standard fit templates of the 256 spectral bin scheme.
+
+    >>> import pyuvs as pu
+    >>> templates = pu.get_psf_convolved_templates(4)
+    >>> templates.shape
+    (4, 256)
+    >>> templates is pu.get_psf_convolved_templates(4)
+    True
+
+    """
+    if templates is None:
+        templates = load_standard_fit_templates()
+    templates = np.ascontiguousarray(templates, dtype=float)
+    return _get_psf_convolved_templates(
+        int(pixels_per_spectral_bin), templates.tobytes(), templates.shape,
+        None if cache_directory is None else str(cache_directory))
+
+
+@lru_cache(maxsize=16)
+def _get_psf_convolved_templates(
+        pixels_per_spectral_bin: int, templates: bytes, shape: tuple,
+        cache_directory: str) -> np.ndarray:
+    digest = sha1(templates).hexdigest()
+    file_path = None if cache_directory is None else \
+        Path(cache_directory) / \
+        f'psf-templates-{pixels_per_spectral_bin}-{digest}.npy'
+    if file_path is not None and file_path.exists():
+        convolved = np.load(file_path)
+    else:
+        convolved = rebin_templates(
+            convolve_templates(np.frombuffer(templates).reshape(shape)),
+            pixels_per_spectral_bin)
+        if file_path is not None:
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            np.save(file_path, convolved)
+    convolved.flags.writeable = False
+    return convolved
+
+
+@lru_cache(maxsize=16)
+def get_shifted_template_bank(pixels_per_spectral_bin: int,
+                              step: float = 0.05, max_shift: float = 5,
+                              convolve_psf: bool = False) -> np.ndarray:
+    """Get the standard fit templates shifted by a range of sub-pixel amounts.
+
+    Each bank is only computed once per process; later calls with the same
+    inputs return the same read-only array.
+
+    Parameters
+    ----------
+    pixels_per_spectral_bin: int
+        The number of detector pixels in each spectral bin.
+    step: float
+        The spacing of the shifts [pixels].
+    max_shift: float
+        The largest shift in either direction [pixels].
+    convolve_psf: bool
+        Whether to shift the templates convolved with the MUV point spread
+        function instead of the stock templates.
+
+    Returns
+    -------
+    np.ndarray
+        The shifted, rebinned templates. This array has shape
+        (n_shifts, 4, n_spectral_bins), where index i along the first axis
+        corresponds to a shift of -max_shift + i * step detector pixels.
+
+    See Also
+    --------
+    load_standard_fit_templates: Load the unshifted templates.
+
+    Notes
+    -----
+    The templates are shifted at the native detector resolution by linear
+    interpolation, then rebinned. A positive shift moves the templates to
+    higher pixels, so the template at pixel x becomes the template at pixel
+    x - shift. The templates are zero where they are shifted off the
+    detector.
+
+    Examples
+    --------
+    Get the bank of the 256 spectral bin scheme.
+
+    >>> import pyuvs as pu
+    >>> pu.get_shifted_template_bank(4).shape
+    (201, 4, 256)
+
+    """
+    shifts = _get_template_bank_shifts(step, max_shift)
+    templates = get_psf_convolved_templates(1) if convolve_psf \
+        else load_standard_fit_templates()
+    n_pixels = templates.shape[-1]
+
+    # Shift by k + f pixels: T(x - k - f) = (1 - f) T(x - k) + f T(x - k - 1)
+    whole_shift = np.floor(shifts).astype(int)
+    fraction = (shifts - whole_shift)[:, np.newaxis]
+    source = np.arange(n_pixels) - whole_shift[:, np.newaxis]
+    padded_templates = np.pad(templates, ((0, 0), (1, 1)))
+    lower = padded_templates[:, np.clip(source, -1, n_pixels) + 1]
+    upper = padded_templates[:, np.clip(source - 1, -1, n_pixels) + 1]
+    shifted = np.moveaxis((1 - fraction) * lower + fraction * upper, 1, 0)
+
+    bank = rebin_templates(shifted.reshape(-1, n_pixels),
+                           pixels_per_spectral_bin)\
+        .reshape(shifts.shape[0], templates.shape[0], -1)
+    bank.flags.writeable = False
+    return bank
+
+
+def _get_template_bank_shifts(step: float, max_shift: float) -> np.ndarray:
+    return np.linspace(-max_shift, max_shift,
+                       num=int(round(2 * max_shift / step)) + 1)
+
+
+def _get_template_bank_index(pixel_shift: np.ndarray, step: float = 0.05,
+                             max_shift: float = 5) -> np.ndarray:
+    # Unknown shifts are assumed to be 0; larger shifts use the largest shift
+    pixel_shift = np.nan_to_num(np.asarray(pixel_shift, dtype=float))
+    index = np.rint((pixel_shift + max_shift) / step)
+    n_shifts = _get_template_bank_shifts(step, max_shift).shape[0]
+    return np.clip(index, 0, n_shifts - 1).astype(int)
+
+
+@lru_cache(maxsize=16)
+def _get_uniform_weight_factorization(
+        pixels_per_spectral_bin: int, starting_spectral_index: int,
+        n_transmitted: int, convolve_psf: bool) \
+        -> SharedWeightsFactorization:
+    scheme = get_spectral_scheme(pixels_per_spectral_bin,
+                                 starting_spectral_index, n_transmitted)
+    templates = _get_scheme_templates(scheme, convolve_psf)
+    return SharedWeightsFactorization(
+        sm.add_constant(templates.T)[scheme.transmitted],
+        np.ones(n_transmitted))
+
+
+def _get_scheme_templates(scheme: SpectralScheme, convolve_psf: bool) \
+        -> np.ndarray:
+    return get_psf_convolved_templates(scheme.pixels_per_spectral_bin) \
+        if convolve_psf else scheme.templates
+
+
+def _fit_nightside_templates(
+        detector_image_dark_subtracted: np.ndarray, uncertainty: np.ndarray,
+        wavelength_width: np.ndarray, pixels_per_spatial_bin: int,
+        pixels_per_spectral_bin: int, starting_spectral_index: int,
+        voltage_gain: float, integration_time: float, engine: str,
+        nonnegative: bool, pixel_shift: np.ndarray, convolve_psf: bool,
+        robust: str, full_output: bool,
+        scheme_templates: np.ndarray = None) \
+        -> Union[np.ndarray, tuple[np.ndarray, dict[str, np.ndarray]]]:
+    if pixel_shift is not None:
+        return _fit_shifted_nightside_templates(
+            detector_image_dark_subtracted, uncertainty, wavelength_width,
+            pixels_per_spatial_bin, pixels_per_spectral_bin,
+            starting_spectral_index, voltage_gain, integration_time, engine,
+            nonnegative, pixel_shift, convolve_psf, robust, full_output)
+
+    # Get the products of this spectral scheme
+    scheme = get_spectral_scheme(
+        pixels_per_spectral_bin, starting_spectral_index,
+        detector_image_dark_subtracted.shape[-1])
+    rebinned_calibration_curve = get_muv_calibration_curve(
+        pixels_per_spatial_bin, pixels_per_spectral_bin,
+        starting_spectral_index, detector_image_dark_subtracted.shape[-1],
+        voltage_gain, integration_time, wavelength_width=wavelength_width)
+    templates = sm.add_constant(
+        (_get_scheme_templates(scheme, convolve_psf)
+         if scheme_templates is None else scheme_templates).T)
+
+    # Fit the templates in the transmitted window instead of padding the data
+    spectra = detector_image_dark_subtracted
+    window_templates = templates[scheme.transmitted]
+    if uncertainty is None:
+        # The cached factorization only applies to the unshifted templates
+        factorization = None if scheme_templates is not None else \
+            _get_uniform_weight_factorization(
+                pixels_per_spectral_bin, starting_spectral_index,
+                detector_image_dark_subtracted.shape[-1], convolve_psf)
+        weights = 1.0
+    else:
+        factorization = None
+        weights = 1 / np.asarray(uncertainty, dtype=float) ** 2
+
+    # Fit templates to the data
+    if engine == 'batched':
+        # Only the template coefficients are constrained, not the constant
+        constraints = [False, True, True, True, True] if nonnegative \
+            else None
+        if robust is None:
+            fit = WeightedLeastSquaresFit(
+                spectra, window_templates, weights, nonnegative=constraints,
+                factorization=factorization)
+        else:
+            fit = RobustLeastSquaresFit(
+                spectra, window_templates, weights, norm=robust,
+                nonnegative=constraints)
+        coefficients = fit.coefficients
+        if full_output:
+            covariance = fit.covariance
+            statistics = {'standard_errors': fit.standard_errors,
+                          'reduced_chi_squared': fit.reduced_chi_squared,
+                          'r_squared': fit.r_squared}
+            if robust is not None:
+                statistics['n_iterations'] = fit.n_iterations
+                statistics['converged'] = fit.converged
+    else:
+        n_parameters = templates.shape[1]
+        coefficients = np.zeros(spectra.shape[:-1] + (n_parameters,))
+        covariance = np.zeros(coefficients.shape + (n_parameters,))
+        statistics = {'standard_errors': np.zeros(coefficients.shape),
+                      'reduced_chi_squared': np.zeros(spectra.shape[:-1]),
+                      'r_squared': np.zeros(spectra.shape[:-1])}
+        weights = np.broadcast_to(weights, spectra.shape)
+        for f in range(spectra.shape[0]):
+            for g in range(spectra.shape[1]):
+                fit = sm.WLS(spectra[f, g, :], window_templates,
+                             weights=weights[f, g, :],
+                             missing='drop').fit()  # This ignores NaNs
+                coefficients[f, g] = fit.params
+                if full_output:
+                    covariance[f, g] = fit.cov_params()
+                    statistics['standard_errors'][f, g] = fit.bse
+                    statistics['reduced_chi_squared'][f, g] = fit.scale
+                    statistics['r_squared'][f, g] = fit.rsquared
+
+    # Each coefficient scales its template, so each brightness is a linear
+    # combination of the coefficients. The rows of this matrix are NO, aurora
+    # (CO Cameron bands + UVD), and solar continuum.
+    template_brightnesses = np.sum(
+        templates * (wavelength_width / rebinned_calibration_curve)[:, None],
+        axis=0)
+    components = np.array([[0, 1, 0, 0, 0],
+                           [0, 0, 1, 1, 0],
+                           [0, 0, 0, 0, 1]]) * template_brightnesses
+    brightnesses = np.moveaxis(coefficients @ components.T, -1, 0)
+
+    if full_output:
+        variance = np.einsum('ci,...ij,cj->c...', components, covariance,
+                             components)
+        statistics = {'brightness_uncertainty': np.sqrt(variance),
+                      'coefficients': coefficients, **statistics}
+        return brightnesses, statistics
+    return brightnesses
+
+
+def _fit_shifted_nightside_templates(
+        detector_image_dark_subtracted: np.ndarray, uncertainty: np.ndarray,
+        wavelength_width: np.ndarray, pixels_per_spatial_bin: int,
+        pixels_per_spectral_bin: int, starting_spectral_index: int,
+        voltage_gain: float, integration_time: float, engine: str,
+        nonnegative: bool, pixel_shift: np.ndarray, convolve_psf: bool,
+        robust: str, full_output: bool) \
+        -> Union[np.ndarray, tuple[np.ndarray, dict[str, np.ndarray]]]:
+    # Integrations with the same shift share their templates, so fit each
+    # group of them with one entry of the bank
+    bank = get_shifted_template_bank(pixels_per_spectral_bin,
+                                     convolve_psf=convolve_psf)
+    bank_index = _get_template_bank_index(pixel_shift)
+    outputs = _make_nightside_fit_outputs(
+        detector_image_dark_subtracted.shape, full_output, robust)
+    for index in np.unique(bank_index):
+        integrations = bank_index == index
+        result = _fit_nightside_templates(
+            detector_image_dark_subtracted[integrations],
+            _get_integrations(uncertainty, integrations), wavelength_width,
+            pixels_per_spatial_bin, pixels_per_spectral_bin,
+            starting_spectral_index, voltage_gain, integration_time, engine,
+            nonnegative, None, convolve_psf, robust, full_output,
+            scheme_templates=bank[index])
+        _store_nightside_fit(outputs, result, integrations, full_output)
+    brightnesses = outputs.pop('brightnesses')
+    return (brightnesses, outputs) if full_output else brightnesses
+
+
+def _get_integrations(array: np.ndarray, integrations) -> np.ndarray:
+    # Arrays shared by all integrations, like some uncertainties, are not split
+    if np.ndim(array) == 3 and array.shape[0] > 1:
+        return array[integrations]
+    return array
+
+
+def _store_nightside_fit(
+        outputs: dict[str, np.ndarray],
+        result: Union[np.ndarray, tuple[np.ndarray, dict[str, np.ndarray]]],
+        integrations, full_output: bool) -> None:
+    brightnesses, statistics = result if full_output else (result, {})
+    for name, value in {'brightnesses': brightnesses, **statistics}.items():
+        # The brightness arrays have the integrations along their first axis
+        index = (slice(None), integrations) \
+            if name.startswith('brightness') else integrations
+        outputs[name][index] = value
+
+
+def _get_nightside_fit_output_shapes(
+        image_shape: tuple, full_output: bool, robust: str) \
+        -> dict[str, tuple]:
+    shapes = {'brightnesses': (3,) + image_shape[:-1]}
+    if full_output:
+        shapes['brightness_uncertainty'] = (3,) + image_shape[:-1]
+        shapes['coefficients'] = image_shape[:-1] + (5,)
+        shapes['standard_errors'] = image_shape[:-1] + (5,)
+        shapes['reduced_chi_squared'] = image_shape[:-1]
+        shapes['r_squared'] = image_shape[:-1]
+        if robust is not None:
+            shapes['n_iterations'] = image_shape[:-1]
+            shapes['converged'] = image_shape[:-1]
+    return shapes
+
+
+def _get_nightside_fit_output_dtype(name: str) -> type:
+    # No output takes more than 8 bytes per element
+    return {'n_iterations': np.int64, 'converged': np.bool_}\
+        .get(name, np.float64)
+
+
+def _make_nightside_fit_outputs(
+        image_shape: tuple, full_output: bool, robust: str) \
+        -> dict[str, np.ndarray]:
+    return {name: np.empty(shape, dtype=_get_nightside_fit_output_dtype(name))
+            for name, shape in _get_nightside_fit_output_shapes(
+                image_shape, full_output, robust).items()}
+
+
+def _fit_nightside_chunk(
+        detector_image_dark_subtracted: np.ndarray, uncertainty: np.ndarray,
+        outputs: dict[str, np.ndarray], integrations: slice, settings: dict,
+        full_output: bool) -> None:
+    if settings['pixel_shift'] is not None:
+        settings = {**settings,
+                    'pixel_shift': settings['pixel_shift'][integrations]}
+    result = _fit_nightside_templates(
+        detector_image_dark_subtracted[integrations],
+        _get_integrations(uncertainty, integrations),
+        full_output=full_output, **settings)
+    _store_nightside_fit(outputs, result, integrations, full_output)
+
+
+def _fit_shared_memory_nightside_chunk(
+        input_blocks: list[tuple[str, tuple]],
+        output_blocks: dict[str, tuple[str, tuple]], integrations: slice,
+        settings: dict, full_output: bool) -> None:
+    # Attach to the cubes made by the parent process instead of receiving
+    # pickled copies of them
+    blocks = []
+    try:
+        arrays = []
+        for name, shape in input_blocks:
+            blocks.append(SharedMemory(name=name))
+            arrays.append(np.ndarray(shape, buffer=blocks[-1].buf))
+        outputs = {}
+        for output, (name, shape) in output_blocks.items():
+            blocks.append(SharedMemory(name=name))
+            outputs[output] = np.ndarray(
+                shape, dtype=_get_nightside_fit_output_dtype(output),
+                buffer=blocks[-1].buf)
+        if len(arrays) == 1:
+            arrays.append(None)
+        _fit_nightside_chunk(*arrays, outputs, integrations, settings,
+                             full_output)
+        del arrays, outputs
+    finally:
+        for block in blocks:
+            block.close()
+
+
+def _fit_nightside_chunks_in_processes(
+        detector_image_dark_subtracted: np.ndarray, uncertainty: np.ndarray,
+        chunks: list[slice], settings: dict, full_output: bool,
+        n_workers: int) -> dict[str, np.ndarray]:
+    output_shapes = _get_nightside_fit_output_shapes(
+        detector_image_dark_subtracted.shape, full_output, settings['robust'])
+    blocks = {}
+    try:
+        input_blocks = []
+        inputs = [('image', detector_image_dark_subtracted)]
+        if uncertainty is not None:
+            # Uncertainties shared by many spectra keep their shape so the
+            # workers still fit them with one shared factorization
+            inputs.append(('uncertainty', uncertainty))
+        for name, array in inputs:
+            blocks[name] = SharedMemory(create=True,
+                                        size=max(array.nbytes, 1))
+            np.ndarray(array.shape, buffer=blocks[name].buf)[:] = array
+            input_blocks.append((blocks[name].name, array.shape))
+        output_blocks = {}
+        for name, shape in output_shapes.items():
+            blocks[name] = SharedMemory(
+                create=True, size=max(int(np.prod(shape)) * 8, 1))
+            output_blocks[name] = (blocks[name].name, shape)
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = [executor.submit(
+                _fit_shared_memory_nightside_chunk, input_blocks,
+                output_blocks, chunk, settings, full_output)
+                for chunk in chunks]
+            for future in futures:
+                future.result()
+        return {name: np.ndarray(
+            shape, dtype=_get_nightside_fit_output_dtype(name),
+            buffer=blocks[name].buf).copy()
+            for name, shape in output_shapes.items()}
+    finally:
+        for block in blocks.values():
+            block.close()
+            block.unlink()
+
+
+def _fit_nightside_chunks_in_threads(
+        detector_image_dark_subtracted: np.ndarray, uncertainty: np.ndarray,
+        chunks: list[slice], settings: dict, full_output: bool,
+        n_workers: int) -> dict[str, np.ndarray]:
+    # Threads share the cubes already, and numpy releases the GIL while it
+    # does the heavy lifting
+    outputs = _make_nightside_fit_outputs(
+        detector_image_dark_subtracted.shape, full_output, settings['robust'])
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        futures = [executor.submit(
+            _fit_nightside_chunk, detector_image_dark_subtracted, uncertainty,
+            outputs, chunk, settings, full_output) for chunk in chunks]
+        for future in futures:
+            future.result()
+    return outputs
+
+
 def fit_muv_templates_to_nightside_data(
         detector_image_dark_subtracted: np.ndarray,
         uncertainty: np.ndarray, wavelength_width: np.ndarray,
         pixels_per_spatial_bin: int, pixels_per_spectral_bin: int,
         starting_spectral_index: int, voltage_gain: float,
-        integration_time: float) -> np.ndarray:
+        integration_time: float, engine: str = 'batched',
+        nonnegative: bool = False, full_output: bool = False,
+        n_workers: int = 1, chunk_size: int = None,
+        executor: str = 'thread', pixel_shift: np.ndarray = None,
+        convolve_psf: bool = False, robust: str = None) \
+        -> Union[np.ndarray, tuple[np.ndarray, dict[str, np.ndarray]]]:
     """Use multiple linear regression (MLR) to fit templates to nightside data.
 
     Parameters
@@ -279,8 +1225,11 @@ def fit_muv_templates_to_nightside_data(
         to be 3-dimensional.
     uncertainty: np.ndarray
         The uncertainty associated with :code:`detector_image_dark_subtracted`.
-        This array is assumed to have the same shape as
-        :code:`detector_image_dark_subtracted`.
+        This array is usually the same shape as
+        :code:`detector_image_dark_subtracted`, but it can be any shape that
+        broadcasts to it, such as (n_integrations, 1, n_wavelengths) for
+        uncertainties shared along the spatial axis. If :code:`None`, all
+        spectral bins are weighted equally.
     wavelength_width: np.ndarray
         The wavelength width. This array is assumed to be 1-dimensional and
         have the same shape as the last axis of
@@ -295,6 +1244,42 @@ def fit_muv_templates_to_nightside_data(
         The voltage gain settings.
     integration_time: float
         The integration time.
+    engine: str
+        The regression engine. :code:`'batched'` solves the weighted normal
+        equations of every spectrum at once; :code:`'statsmodels'` fits each
+        spectrum with its own statsmodels WLS model and is kept as the
+        reference implementation.
+    nonnegative: bool
+        Whether to constrain the template coefficients to be non-negative.
+        This is only supported by the batched engine.
+    full_output: bool
+        Whether to also return the uncertainties and goodness of fit.
+    n_workers: int
+        The number of workers that fit chunks of integrations concurrently.
+        This must be at least 1.
+    chunk_size: int
+        The number of integrations in each chunk. If :code:`None`, the
+        integrations are split evenly among the workers. If provided, this
+        must be at least 1.
+    executor: str
+        The kind of workers. :code:`'thread'` uses a thread pool;
+        :code:`'process'` uses a process pool, in which case the input and
+        output cubes are put in shared memory instead of being pickled.
+    pixel_shift: np.ndarray
+        The wavelength shift [pixels] of each integration, such as
+        :code:`L1bFile.integration.pixel_shift`. If provided, each integration
+        is fit with templates shifted by the nearest 1/20 pixel from
+        :func:`get_shifted_template_bank`. If :code:`None`, the templates are
+        not shifted.
+    convolve_psf: bool
+        Whether to fit the templates convolved with the MUV point spread
+        function from :func:`get_psf_convolved_templates`. They are convolved
+        once per spectral scheme, so this does not slow down the fit.
+    robust: str
+        The norm of a robust fit that downweights outliers such as cosmic
+        rays and hot pixels. Either :code:`'huber'` or :code:`'tukey'`. If
+        :code:`None`, the fit is not robust. This is only supported by the
+        batched engine.
 
     Returns
     -------
@@ -303,6 +1288,29 @@ def fit_muv_templates_to_nightside_data(
         shape (3, n_integrations, n_positions). Along the first axis, index 0
         corresponds to NO nightglow, index 1 corresponds to aurora, and index
         2 corresponds to solar continuum.
+    dict[str, np.ndarray]
+        Only returned if :code:`full_output` is True. The fit statistics:
+
+        * :code:`'brightness_uncertainty'`: the uncertainties of the
+          brightnesses, with the same shape as the brightnesses.
+        * :code:`'coefficients'`: the fit coefficients of the constant and
+          the 4 templates, with shape (n_integrations, n_positions, 5).
+        * :code:`'standard_errors'`: the standard errors of the coefficients.
+        * :code:`'reduced_chi_squared'`: the reduced chi squared of each fit,
+          with shape (n_integrations, n_positions).
+        * :code:`'r_squared'`: the coefficient of determination of each fit.
+        * :code:`'n_iterations'`: only for robust fits. The number of
+          reweighting iterations of each fit.
+        * :code:`'converged'`: only for robust fits. Whether each fit
+          converged.
+
+    Raises
+    ------
+    ValueError
+        Raised if :code:`engine`, :code:`executor`, or :code:`robust` is not
+        recognized, if :code:`n_workers` or :code:`chunk_size` is less than 1,
+        or if a non-negative or robust fit is requested from the statsmodels
+        engine.
 
     Notes
     -----
@@ -313,48 +1321,330 @@ def fit_muv_templates_to_nightside_data(
     This function also uses the MUV wavelengths and MUV sensitivity curve that
     comes with pyuvs.
 
+    The templates are sliced to the transmitted spectral bins, so the data are
+    fit without padding them to the full spectral scheme. The brightnesses
+    still integrate the templates over the full scheme.
+
+    Both engines drop NaN spectral bins from the fit and give numerically
+    equivalent results, but the batched engine is orders of magnitude faster.
+
+    The non-negative fit solves the constrained problems of all spectra
+    together; see :class:`WeightedLeastSquaresFit`. The constant is never
+    constrained.
+
+    The robust fit iteratively reweights all unconverged spectra at once;
+    see :class:`RobustLeastSquaresFit`. Its uncertainties and goodness of fit
+    are those of the final reweighted fit.
+
+    The brightness uncertainties are propagated from the full coefficient
+    covariance, so the aurora uncertainty accounts for the correlation between
+    the CO Cameron band and UVD coefficients. Like the coefficient standard
+    errors, they are scaled by the reduced chi squared.
+
+    When the uncertainties are shared by many spectra, the batched engine
+    fits them all with one precomputed projection of the templates. The
+    projection for equal weights is cached for each spectral scheme.
+
+    Each spectrum is fit independently, so the results do not depend on the
+    number of workers or the chunk size. When correcting for the pixel shift,
+    the integrations with the same shift are fit together.
+
+    Chunking is not a speedup in itself. The batched fit of a whole file is
+    already vectorized, so a single worker is usually as fast as several for
+    it. More workers only help on machines with several cores, and mostly
+    for slow fits such as robust or statsmodels fits. Smaller chunks also
+    bound the memory used by the intermediate arrays of each fit.
+
     """
-    # Compute some detector curves
-    rebinned_wavelengths = rebin_muv_wavelengths(pixels_per_spectral_bin)
-    rebinned_sensitivity_curve = np.interp(
-        rebinned_wavelengths,
-        load_muv_sensitivity_curve_observational()[:, 0],
-        load_muv_sensitivity_curve_observational()[:, 1])
-    rebinned_calibration_curve = calculate_calibration_curve(
-        rebinned_sensitivity_curve,
-        pixels_per_spatial_bin, wavelength_width,
-        voltage_gain, integration_time)
+    if engine not in ['batched', 'statsmodels']:
+        message = f'{engine} is not a regression engine. Use either ' \
+                  f'\'batched\' or \'statsmodels\'.'
+        raise ValueError(message)
+    if nonnegative and engine != 'batched':
+        message = 'Non-negative fits are only supported by the batched ' \
+                  'engine.'
+        raise ValueError(message)
+    if robust is not None and engine != 'batched':
+        message = 'Robust fits are only supported by the batched engine.'
+        raise ValueError(message)
+    if executor not in ['thread', 'process']:
+        message = f'{executor} is not an executor. Use either \'thread\' ' \
+                  f'or \'process\'.'
+        raise ValueError(message)
+    if n_workers < 1 or (chunk_size is not None and chunk_size < 1):
+        message = 'n_workers and chunk_size must be at least 1.'
+        raise ValueError(message)
+    settings = {'wavelength_width': wavelength_width,
+                'pixels_per_spatial_bin': pixels_per_spatial_bin,
+                'pixels_per_spectral_bin': pixels_per_spectral_bin,
+                'starting_spectral_index': starting_spectral_index,
+                'voltage_gain': voltage_gain,
+                'integration_time': integration_time, 'engine': engine,
+                'nonnegative': nonnegative,
+                'pixel_shift': None if pixel_shift is None
+                else np.asarray(pixel_shift), 'convolve_psf': convolve_psf,
+                'robust': robust}
+    if n_workers == 1 and chunk_size is None:
+        return _fit_nightside_templates(
+            detector_image_dark_subtracted, uncertainty,
+            full_output=full_output, **settings)
+
+    n_integrations = detector_image_dark_subtracted.shape[0]
+    if chunk_size is None:
+        chunk_size = -(-n_integrations // n_workers)
+    chunks = [slice(i, i + chunk_size)
+              for i in range(0, n_integrations, chunk_size)]
+    fit_chunks = _fit_nightside_chunks_in_threads if executor == 'thread' \
+        else _fit_nightside_chunks_in_processes
+    outputs = fit_chunks(
+        np.asarray(detector_image_dark_subtracted, dtype=float),
+        None if uncertainty is None else np.asarray(uncertainty, dtype=float),
+        chunks, settings, full_output,
+        n_workers)
+    brightnesses = outputs.pop('brightnesses')
+    return (brightnesses, outputs) if full_output else brightnesses
+
+
+def find_saturated_bins(detector_image: np.ndarray,
+                        pixels_per_spatial_bin: int,
+                        pixels_per_spectral_bin: int) -> np.ndarray:
+    """Find the detector image bins that may be saturated.
+
+    Parameters
+    ----------
+    detector_image: np.ndarray
+        The raw detector image [DN].
+    pixels_per_spatial_bin: int
+        The number of detector pixels in each spatial bin.
+    pixels_per_spectral_bin: int
+        The number of detector pixels in each spectral bin.
 
-    # Rebin the templates
-    fit_templates = load_standard_fit_templates()
-    rebinned_templates = rebin_templates(fit_templates, pixels_per_spectral_bin).T
-    templates = sm.add_constant(rebinned_templates)
+    Returns
+    -------
+    np.ndarray
+        True where a bin is at least the well depth of all of its detector
+        pixels. This array has the same shape as :code:`detector_image`.
 
-    # Pad nans
-    spectral_scheme = 1024 // pixels_per_spectral_bin
-    spectra = pad_spectral_image_with_nan(
-        detector_image_dark_subtracted, spectral_scheme, starting_spectral_index)
-    uncertainty = pad_spectral_image_with_nan(
-        uncertainty, spectral_scheme, starting_spectral_index)
+    Examples
+    --------
+    Exclude saturated bins from a fit by setting them to NaN, then find the
+    spectra that need to be refit.
 
-    # Fit templates to the data
-    brightnesses = np.zeros((3,) + detector_image_dark_subtracted.shape[:-1])
-    for f in range(brightnesses.shape[1]):
-        for g in range(brightnesses.shape[2]):
-            fit = sm.WLS(spectra[f, g, :], templates,
-                         weights=1 / uncertainty[f, g, :] ** 2,
-                         missing='drop').fit()  # This ignores NaNs
-            coeff = fit.params
-            no_brightness = np.sum(coeff[1] * templates[:, 1] * wavelength_width / rebinned_calibration_curve)
-            aurora_brightness = np.sum(coeff[2] * templates[:, 2] * wavelength_width  / rebinned_calibration_curve) + \
-                                np.sum(coeff[3] * templates[:, 3] * wavelength_width / rebinned_calibration_curve)
-            solar_brightness = np.sum(coeff[4] * templates[:, 4] * wavelength_width  / rebinned_calibration_curve)
-
-            brightnesses[0, f, g] = no_brightness
-            brightnesses[1, f, g] = aurora_brightness
-            brightnesses[2, f, g] = solar_brightness
+    >>> import numpy as np
+    >>> import pyuvs as pu
+    >>> raw = np.zeros((10, 50, 200))
+    >>> raw[2, 3, 40] = 1e6
+    >>> saturated = pu.find_saturated_bins(raw, 8, 4)
+    >>> dark_subtracted = np.where(saturated, np.nan, raw)
+    >>> np.argwhere(np.any(saturated, axis=-1))
+    array([[2, 3]])
 
-    return brightnesses
+    """
+    return np.asarray(detector_image) >= cmos_pixel_well_depth * \
+        pixels_per_spatial_bin * pixels_per_spectral_bin
+
+
+def refit_muv_templates_to_nightside_data(
+        previous_fit: Union[np.ndarray, tuple[np.ndarray, dict]],
+        refit: np.ndarray, detector_image_dark_subtracted: np.ndarray,
+        uncertainty: np.ndarray, wavelength_width: np.ndarray,
+        pixels_per_spatial_bin: int, pixels_per_spectral_bin: int,
+        starting_spectral_index: int, voltage_gain: float,
+        integration_time: float, **kwargs) \
+        -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """Refit templates to only some of the spectra of a previous fit.
+
+    Parameters
+    ----------
+    previous_fit: np.ndarray or tuple
+        The output of :func:`fit_muv_templates_to_nightside_data` (or of this
+        function) to update.
+    refit: np.ndarray
+        True for each spectrum to refit, such as the spectra with a changed
+        quality mask. This array has shape (n_integrations, n_positions).
+    detector_image_dark_subtracted: np.ndarray
+        The detector image with dark current subtracted. Only the spectra
+        that are refit are used.
+    uncertainty: np.ndarray
+        The uncertainty associated with :code:`detector_image_dark_subtracted`.
+        This can be any shape that broadcasts to it, or :code:`None`.
+    wavelength_width: np.ndarray
+        The wavelength width.
+    pixels_per_spatial_bin: int
+        The number of detector pixels in each spatial bin.
+    pixels_per_spectral_bin: int
+        The number of detector pixels in each spectral bin.
+    starting_spectral_index: int
+        The starting spectral index.
+    voltage_gain: float
+        The voltage gain settings.
+    integration_time: float
+        The integration time.
+    kwargs
+        Any other keyword arguments of
+        :func:`fit_muv_templates_to_nightside_data`, such as :code:`robust`
+        or :code:`pixel_shift`. They only apply to the spectra that are refit.
+
+    Returns
+    -------
+    np.ndarray
+        The merged brightnesses.
+    dict[str, np.ndarray]
+        The merged fit statistics, if :code:`previous_fit` has them, and
+        :code:`'refit'`, which is True for the spectra refit by this call.
+
+    Raises
+    ------
+    ValueError
+        Raised if :code:`refit` does not match the shape of the spectra, or
+        if the refit does not make the same statistics as the previous fit.
+
+    See Also
+    --------
+    find_saturated_bins: Find the bins to exclude from a refit.
+
+    Notes
+    -----
+    The spectra to refit are gathered into one cube and fit in one batch, so
+    the cost only grows with the number of spectra that are refit. The
+    previous fit is not modified.
+
+    Examples
+    --------
+    Drop a hot pixel from an orbit and only refit the spectra it touched.
+
+    >>> import numpy as np
+    >>> import pyuvs as pu
+    >>> rng = np.random.default_rng(0)
+    >>> templates = pu.get_spectral_scheme(4, 20, 200).templates[:, 20:220]
+    >>> image = rng.uniform(1, 5, size=(10, 50, 4)) @ templates + 3
+    >>> fit = pu.fit_muv_templates_to_nightside_data(
+    ...     image, None, 0.65, 8, 4, 20, 10, 4)
+    >>> image[:, 17, 60] = np.nan
+    >>> refit = np.zeros((10, 50), dtype=bool)
+    >>> refit[:, 17] = True
+    >>> brightnesses, statistics = pu.refit_muv_templates_to_nightside_data(
+    ...     fit, refit, image, None, 0.65, 8, 4, 20, 10, 4)
+    >>> int(np.sum(statistics['refit']))
+    10
+
+    """
+    full_output = isinstance(previous_fit, tuple)
+    brightnesses, statistics = previous_fit if full_output \
+        else (previous_fit, {})
+    refit = np.asarray(refit, dtype=bool)
+    image_shape = np.shape(detector_image_dark_subtracted)
+    if refit.shape != image_shape[:-1]:
+        message = f'The refit mask shape {refit.shape} does not match the ' \
+                  f'spectra shape {image_shape[:-1]}.'
+        raise ValueError(message)
+
+    # Fit the chosen spectra as one position in many integrations
+    if uncertainty is not None:
+        uncertainty = np.broadcast_to(uncertainty, image_shape)[refit][
+            :, np.newaxis]
+    if kwargs.get('pixel_shift') is not None:
+        kwargs['pixel_shift'] = np.broadcast_to(
+            np.asarray(kwargs['pixel_shift'])[:, np.newaxis], refit.shape)[
+            refit]
+    result = fit_muv_templates_to_nightside_data(
+        np.asarray(detector_image_dark_subtracted)[refit][:, np.newaxis],
+        uncertainty, wavelength_width, pixels_per_spatial_bin,
+        pixels_per_spectral_bin, starting_spectral_index, voltage_gain,
+        integration_time, full_output=full_output, **kwargs)
+    new_brightnesses, new_statistics = result if full_output \
+        else (result, {})
+    statistics = {name: value for name, value in statistics.items()
+                  if name != 'refit'}
+    if set(new_statistics) != set(statistics):
+        message = f'The refit statistics {sorted(new_statistics)} do not ' \
+                  f'match the previous statistics {sorted(statistics)}.'
+        raise ValueError(message)
+
+    # Merge the refit spectra into copies of the previous outputs
+    outputs = {'brightnesses': np.array(brightnesses),
+               **{name: np.array(value) for name, value in statistics.items()}}
+    new_outputs = {'brightnesses': new_brightnesses, **new_statistics}
+    for name, value in new_outputs.items():
+        if name.startswith('brightness'):
+            outputs[name][:, refit] = value[:, :, 0]
+        else:
+            outputs[name][refit] = value[:, 0]
+    brightnesses = outputs.pop('brightnesses')
+    return brightnesses, {**outputs, 'refit': refit}
+
+
+def _get_nightside_fit_settings(file) -> tuple:
+    scheme = get_binning_spectral_scheme(file.binning)
+    pixels_per_spatial_bin = \
+        int(np.median(file.binning.spatial_pixel_bin_width))
+    return (np.median(file.observation.wavelength_width),
+            pixels_per_spatial_bin, scheme.pixels_per_spectral_bin,
+            scheme.starting_spectral_index, file.observation.voltage_gain,
+            file.observation.integration_time)
+
+
+def fit_muv_templates_to_nightside_files(
+        files: Iterable, engine: str = 'batched', nonnegative: bool = False,
+        full_output: bool = False, correct_pixel_shift: bool = False,
+        convolve_psf: bool = False, robust: str = None) -> Iterator[tuple]:
+    """Fit templates to nightside data one file at a time.
+
+    Parameters
+    ----------
+    files: Iterable
+        The nightside files to fit. Each item can be either an
+        :class:`~pyuvs.datafiles.L1bFile` or the path to one, in which case
+        the file is only opened when it is reached.
+    engine: str
+        The regression engine. See
+        :func:`fit_muv_templates_to_nightside_data`.
+    nonnegative: bool
+        Whether to constrain the template coefficients to be non-negative.
+    full_output: bool
+        Whether to also yield the uncertainties and goodness of fit.
+    correct_pixel_shift: bool
+        Whether to fit each integration with templates shifted by its
+        :code:`L1bFile.integration.pixel_shift`.
+    convolve_psf: bool
+        Whether to fit the templates convolved with the MUV point spread
+        function.
+    robust: str
+        The norm of a robust fit. See
+        :func:`fit_muv_templates_to_nightside_data`.
+
+    Yields
+    ------
+    tuple
+        The :class:`~pyuvs.datafiles.L1bFile` and the output of
+        :func:`fit_muv_templates_to_nightside_data` for that file.
+
+    See Also
+    --------
+    fit_muv_templates_to_nightside_data: Fit templates to a detector image.
+
+    Notes
+    -----
+    Each file is fit with its own binning, voltage gain, and integration time.
+    The rebinned templates and fit projections are cached for each spectral
+    scheme, so they are reused by every file taken with that scheme. Only one
+    file's detector images are fit at a time, so the peak memory does not grow
+    with the number of files.
+
+    """
+    # Import this here so spectra does not depend on the data file readers
+    from pyuvs.datafiles.contents import L1bFile
+
+    for file in files:
+        if isinstance(file, (str, Path)):
+            file = L1bFile(Path(file))
+        yield file, fit_muv_templates_to_nightside_data(
+            file.detector_image.dark_subtracted,
+            file.detector_image.random_uncertainty_dn,
+            *_get_nightside_fit_settings(file), engine=engine,
+            nonnegative=nonnegative, full_output=full_output,
+            pixel_shift=file.integration.pixel_shift if correct_pixel_shift
+            else None, convolve_psf=convolve_psf, robust=robust)
 
 
 if __name__ == '__main__':
@@ -63,3 +63,199 @@ def swath_number(mirror_angles: np.ndarray) -> np.ndarray:
         return np.floor(interp_swaths).astype('int')
     else:
         return np.zeros(mirror_angles.shape)
+
+
+def _grouped_median(values: np.ndarray, groups: np.ndarray, n_groups: int) \
+        -> np.ndarray:
+    # Sort by group, then by value, so each group's median is in the middle of
+    # its contiguous run
+    order = np.lexsort((values, groups))
+    sorted_values = values[order]
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.cumsum(counts) - counts
+    lower = starts + (counts - 1) // 2
+    upper = starts + counts // 2
+    medians = np.full(n_groups, np.nan)
+    has_values = counts > 0
+    medians[has_values] = (sorted_values[lower[has_values]] +
+                           sorted_values[upper[has_values]]) / 2
+    return medians
+
+
+def grouped_swath_number(mirror_angles: np.ndarray, segments: np.ndarray) \
+        -> np.ndarray:
+    """Make the swath number associated with each mirror angle of many orbital
+    segments at once.
+
+    Parameters
+    ----------
+    mirror_angles: np.ndarray
+        1D array of the mirror angles of all the segments.
+    segments: np.ndarray
+        1D array of the segment ID (for instance, the orbit number and segment)
+        of each mirror angle. The IDs can be any integers, and the mirror
+        angles of a segment do not need to be contiguous, but they must be in
+        time order within each segment.
+
+    Returns
+    -------
+    np.ndarray
+        The swath number associated with each mirror angle. Each segment's
+        swaths start at 0.
+
+    See Also
+    --------
+    swath_number: Get the swath numbers of one segment.
+
+    Notes
+    -----
+    Each segment is segmented exactly like :func:`swath_number` does, but the
+    per-segment median steps are found with one grouped median and the swaths
+    are counted with one cumulative sum, so there is no loop over segments.
+
+    Examples
+    --------
+    Get the swath numbers of 2 segments.
+
+    >>> import numpy as np
+    >>> import pyuvs as pu
+    >>> mirror_angles = np.array([40, 41, 42, 30, 31, 50, 51, 52, 53])
+    >>> segments = np.array([0, 0, 0, 0, 0, 1, 1, 1, 1])
+    >>> pu.grouped_swath_number(mirror_angles, segments)
+    array([0, 0, 0, 1, 1, 0, 0, 0, 0])
+
+    """
+    mirror_angles = np.asarray(mirror_angles, dtype=float)
+    _, groups = np.unique(segments, return_inverse=True)
+    groups = groups.ravel()
+    n_groups = np.max(groups, initial=-1) + 1
+
+    # Put each segment's angles next to each other in time order
+    order = np.argsort(groups, kind='stable')
+    angles = mirror_angles[order]
+    sorted_groups = groups[order]
+    mirror_change = np.diff(angles)
+    same_segment = sorted_groups[1:] == sorted_groups[:-1]
+    change_groups = sorted_groups[1:][same_segment]
+    threshold = np.abs(_grouped_median(
+        mirror_change[same_segment], change_groups, n_groups)) * 4
+
+    discontinuities = np.zeros(angles.shape, dtype=int)
+    discontinuities[1:][same_segment] = \
+        np.abs(mirror_change[same_segment]) > threshold[change_groups]
+    swaths = np.cumsum(discontinuities)
+    segment_starts = np.flatnonzero(np.concatenate([[True], ~same_segment])) \
+        if angles.shape[0] > 0 else np.zeros((0,), dtype=int)
+    swaths -= np.repeat(swaths[segment_starts],
+                        np.diff(np.append(segment_starts, angles.shape[0])))
+
+    swath_numbers = np.empty(angles.shape, dtype=int)
+    swath_numbers[order] = swaths
+    return swath_numbers
+
+
+class SwathSegmenter:
+    """An incremental swath segmenter that assigns swath numbers one file at a
+    time.
+
+    Files from an orbital segment often arrive one at a time. This assigns
+    the swath numbers of each new file as soon as it arrives, using only the
+    new mirror angles and a small state carried over from the previous files.
+
+    Parameters
+    ----------
+    state: dict
+        The state of a previous segmenter, as given by its
+        :py:attr:`state`. If :code:`None`, the segmenter starts a new segment.
+
+    See Also
+    --------
+    swath_number: Segment all the mirror angles of a segment at once.
+
+    Notes
+    -----
+    The steps within each file are compared to 4 times the median step of
+    that file, so files with different scan rates (such as dayside and
+    nightside files) do not need to be balanced. The step from the previous
+    file to a new one is compared to the median step of the new file, or of
+    the last file with more than one integration if the new file only has
+    one. Each file is processed in time proportional to its number of
+    integrations.
+
+    Examples
+    --------
+    Segment the mirror angles of a segment as its files arrive.
+
+    >>> import numpy as np
+    >>> import pyuvs as pu
+    >>> segmenter = pu.SwathSegmenter()
+    >>> segmenter.update(np.array([40, 41, 42, 43]))
+    array([0, 0, 0, 0])
+    >>> segmenter.update(np.array([35, 36, 37]))
+    array([1, 1, 1])
+
+    Save the state between runs and resume from it.
+
+    >>> import json
+    >>> state = json.dumps(segmenter.state)
+    >>> pu.SwathSegmenter(json.loads(state)).update(np.array([30, 31]))
+    array([2, 2])
+
+    """
+    def __init__(self, state: dict = None):
+        state = {} if state is None else state
+        self._last_mirror_angle = state.get('last_mirror_angle')
+        self._step = state.get('step')
+        self._swath = state.get('swath', 0)
+
+    @property
+    def state(self) -> dict:
+        """Get the state of the segmenter. This only holds Python scalars, so
+        it can be serialized with, for instance, :code:`json`.
+
+        """
+        return {'last_mirror_angle': self._last_mirror_angle,
+                'step': self._step, 'swath': self._swath}
+
+    @property
+    def swath(self) -> int:
+        """Get the swath number of the last mirror angle.
+
+        """
+        return self._swath
+
+    def update(self, mirror_angles: np.ndarray) -> np.ndarray:
+        """Assign swath numbers to the mirror angles of the next file.
+
+        Parameters
+        ----------
+        mirror_angles: np.ndarray
+            1D array of the mirror angles (or, equivalently, the field of
+            view) of the next file of the segment.
+
+        Returns
+        -------
+        np.ndarray
+            The swath number associated with each mirror angle.
+
+        """
+        mirror_angles = np.asarray(mirror_angles, dtype=float)
+        if mirror_angles.shape[0] == 0:
+            return np.zeros((0,), dtype=int)
+        mirror_change = np.diff(mirror_angles)
+        if mirror_change.shape[0] > 0:
+            self._step = float(np.abs(np.median(mirror_change)))
+
+        # Prepend the step from the previous file, if there was one
+        if self._last_mirror_angle is not None:
+            mirror_change = np.concatenate(
+                [[mirror_angles[0] - self._last_mirror_angle], mirror_change])
+        discontinuities = np.zeros(mirror_angles.shape, dtype=int)
+        if self._step is not None and mirror_change.shape[0] > 0:
+            discontinuities[-mirror_change.shape[0]:] = \
+                np.abs(mirror_change) > self._step * 4
+        swath_numbers = self._swath + np.cumsum(discontinuities)
+
+        self._last_mirror_angle = float(mirror_angles[-1])
+        self._swath = int(swath_numbers[-1])
+        return swath_numbers
@@ -0,0 +1,115 @@
+import os
+from pathlib import Path
+import numpy as np
+import pytest
+from pyuvs.anc import build_ancillary_bundle, clear_ancillary_cache, \
+    get_ancillary_cache_info, load_muv_wavelength_centers, \
+    load_template_no_nightglow, set_ancillary_memory_map, \
+    _get_anc_directory, _get_ancillary_array, _get_bundle_path
+
+
+class TestAncillaryCache:
+    @pytest.fixture(autouse=True)
+    def empty_cache(self):
+        clear_ancillary_cache()
+        yield
+        clear_ancillary_cache()
+
+    def test_repeated_load_is_a_cache_hit(self):
+        load_template_no_nightglow()
+        load_template_no_nightglow()
+        info = get_ancillary_cache_info()
+        assert (info.hits, info.misses) == (1, 1)
+
+    def test_loaded_array_is_read_only(self):
+        template = load_template_no_nightglow()
+        with pytest.raises(ValueError):
+            template[0] = 0
+
+    def test_read_only_flag_cannot_be_reset(self):
+        template = load_template_no_nightglow()
+        with pytest.raises(ValueError):
+            template.flags.writeable = True
+
+    def test_copy_of_loaded_array_is_writeable(self):
+        wavelengths = np.copy(load_muv_wavelength_centers())
+        wavelengths[0] = 0
+        assert load_muv_wavelength_centers()[0] != 0
+
+    def test_cache_is_bounded(self):
+        assert get_ancillary_cache_info().maxsize is not None
+
+
+class TestAncillaryMemoryMap:
+    @pytest.fixture(autouse=True)
+    def memory_map(self):
+        set_ancillary_memory_map(True)
+        yield
+        set_ancillary_memory_map(False)
+
+    def test_memory_mapped_array_matches_loaded_array(self):
+        mapped = load_template_no_nightglow()
+        set_ancillary_memory_map(False)
+        assert np.array_equal(mapped, load_template_no_nightglow())
+
+    def test_memory_mapped_array_is_plain_ndarray(self):
+        assert type(load_template_no_nightglow()) is np.ndarray
+
+    def test_memory_mapped_array_is_read_only(self):
+        template = load_template_no_nightglow()
+        with pytest.raises(ValueError):
+            template.flags.writeable = True
+
+
+class TestAncillaryBundle:
+    @pytest.fixture
+    def npy_files(self):
+        yield sorted(_get_anc_directory().glob('*/*.npy'))
+
+    @pytest.mark.parametrize('memory_map', [False, True])
+    def test_bundle_matches_npy_files(self, npy_files, memory_map):
+        set_ancillary_memory_map(memory_map)
+        try:
+            for file in npy_files:
+                bundled = _get_ancillary_array(file.parent.name, file.name)
+                expected = np.load(str(file))
+                assert bundled.dtype == expected.dtype
+                assert np.array_equal(bundled, expected, equal_nan=True)
+                assert not bundled.flags.writeable
+        finally:
+            set_ancillary_memory_map(False)
+
+    def test_shipped_bundle_is_up_to_date(self, tmp_path):
+        rebuilt = build_ancillary_bundle(tmp_path / 'ancillary.bundle')
+        assert Path(rebuilt).read_bytes() == _get_bundle_path().read_bytes()
+
+    @pytest.fixture
+    def anc_directory(self, tmp_path, monkeypatch):
+        (tmp_path / 'templates').mkdir()
+        np.save(str(tmp_path / 'templates' / 'template.npy'), np.arange(5.))
+        monkeypatch.setattr('pyuvs.anc._get_anc_directory', lambda: tmp_path)
+        monkeypatch.setattr('pyuvs.anc._get_bundle_path',
+                            lambda: tmp_path / 'ancillary.bundle')
+        build_ancillary_bundle()
+        yield tmp_path
+        clear_ancillary_cache()
+
+    def test_arrays_are_private_copies_of_bundle_by_default(
+            self, anc_directory):
+        os.remove(anc_directory / 'templates' / 'template.npy')
+        array = _get_ancillary_array('templates', 'template.npy')
+        assert np.array_equal(array, np.arange(5.))
+        assert not isinstance(array.base, np.memmap)
+        with pytest.raises(ValueError):
+            array.flags.writeable = True
+
+    @pytest.mark.parametrize('values', [np.arange(7.), np.arange(5.) + 1])
+    def test_regenerated_file_is_not_shadowed_by_bundle(
+            self, anc_directory, values):
+        file = anc_directory / 'templates' / 'template.npy'
+        np.save(str(file), values)
+        bundle_mtime_ns = (anc_directory / 'ancillary.bundle').stat()\
+            .st_mtime_ns
+        os.utime(file, ns=(bundle_mtime_ns + 10 ** 9,) * 2)
+        array = _get_ancillary_array('templates', 'template.npy')
+        assert np.array_equal(array, values)
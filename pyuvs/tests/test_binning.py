@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from pyuvs.binning import rebin_pixels
+from pyuvs.spectra import rebin_templates, rebin_wavelengths
+
+
+class TestRebinPixels:
+    @pytest.fixture
+    def cube(self):
+        yield np.random.default_rng(0).uniform(size=(3, 5, 1024))
+
+    def test_uniform_rebinning_matches_reshape_rebinning(self, cube):
+        expected = cube[0].reshape(5, 256, 4)
+        assert np.allclose(rebin_templates(cube[0], 4),
+                           expected.sum(axis=-1))
+        assert np.allclose(rebin_wavelengths(cube[0, 0], 4),
+                           expected[0].mean(axis=-1))
+
+    def test_indivisible_uniform_rebinning_raises_value_error(self, cube):
+        with pytest.raises(ValueError):
+            rebin_templates(cube[0], 3)
+
+    def test_non_uniform_table_matches_loop(self, cube):
+        low = np.array([0, 80, 84, 90, 500])
+        high = np.array([79, 83, 89, 499, 1023])
+        rebinned = rebin_pixels(cube, low[None, :], high[None, :])
+        expected = np.stack([np.sum(cube[..., lo:hi + 1], axis=-1)
+                             for lo, hi in zip(low, high)], axis=-1)
+        assert np.allclose(rebinned, expected)
+
+    def test_spatial_axis_can_be_rebinned(self, cube):
+        rebinned = rebin_pixels(cube, np.array([0, 2]), np.array([1, 4]),
+                                axis=1)
+        assert rebinned.shape == (3, 2, 1024)
+        assert np.allclose(rebinned[:, 1], np.sum(cube[:, 2:], axis=1))
+
+    def test_nan_only_affects_its_bin(self, cube):
+        cube[0, 0, 5] = np.nan
+        rebinned = rebin_pixels(cube[0, 0], np.array([0, 8]),
+                                np.array([7, 15]))
+        assert np.isnan(rebinned[0])
+        assert np.isfinite(rebinned[1])
+
+    def test_bin_outside_pixels_raises_value_error(self, cube):
+        with pytest.raises(ValueError):
+            rebin_pixels(cube, np.array([1020]), np.array([1024]))
@@ -0,0 +1,74 @@
+import os
+import pytest
+from pyuvs.datafiles.catalog import FileCatalog
+from pyuvs.datafiles.path import find_all_file_paths, \
+    find_latest_file_paths_from_block
+
+
+def make_file(directory, description, timestamp, version='v13',
+              revision='r01'):
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f'mvn_iuv_l1b_{description}_{timestamp}_{version}_' \
+                       f'{revision}.fits.gz'
+    path.touch()
+    return path
+
+
+class TestFileCatalog:
+    @pytest.fixture
+    def data_directory(self, tmp_path):
+        block = tmp_path / 'orbit03400'
+        for orbit in [3453, 3454]:
+            for channel in ['muv', 'fuv']:
+                for hour in range(3):
+                    make_file(block, f'apoapse-orbit0{orbit}-{channel}',
+                              f'20160708T0{hour}4652')
+        make_file(block, 'apoapse-orbit03453-muv', '20160708T004652',
+                  revision='r02')
+        make_file(block, 'periapse-orbit03453-muv', '20160708T104652')
+        (block / 'notes.txt').touch()
+        yield tmp_path
+
+    def test_all_files_match_glob(self, data_directory):
+        with FileCatalog(data_directory) as catalog:
+            assert catalog.find_all_file_paths('apoapse', 3453, 'muv') == \
+                find_all_file_paths(data_directory / 'orbit03400', 'apoapse',
+                                    3453, 'muv')
+
+    def test_latest_files_match_block_search(self, data_directory):
+        with FileCatalog(data_directory) as catalog:
+            latest = catalog.find_latest_apoapse_muv_file_paths(3453)
+        assert latest == find_latest_file_paths_from_block(
+            data_directory, 'apoapse', 3453, 'muv')
+        assert len(latest) == 3
+
+    def test_catalog_persists_between_sessions(self, data_directory,
+                                               tmp_path):
+        database = tmp_path / 'catalog.sqlite'
+        with FileCatalog(data_directory, database) as catalog:
+            expected = catalog.find_all_file_paths('apoapse', 3454, 'fuv')
+        with FileCatalog(data_directory, database, refresh=False) as catalog:
+            assert catalog.find_all_file_paths('apoapse', 3454, 'fuv') == \
+                expected
+
+    def test_refresh_finds_new_and_removed_files(self, data_directory):
+        with FileCatalog(data_directory) as catalog:
+            new_block = data_directory / 'orbit03500'
+            new_file = make_file(new_block, 'apoapse-orbit03501-muv',
+                                 '20160801T004652')
+            removed = catalog.find_all_file_paths('apoapse', 3454, 'muv')[0]
+            os.remove(removed)
+            catalog.refresh()
+            assert catalog.find_all_file_paths('apoapse', 3501, 'muv') == \
+                [new_file]
+            assert removed not in \
+                catalog.find_all_file_paths('apoapse', 3454, 'muv')
+
+    def test_refresh_forgets_removed_directories(self, data_directory):
+        with FileCatalog(data_directory) as catalog:
+            block = data_directory / 'orbit03400'
+            for path in block.iterdir():
+                os.remove(path)
+            os.rmdir(block)
+            catalog.refresh()
+            assert catalog.find_all_file_paths('apoapse', 3453, 'muv') == []
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from pyuvs.anc import load_flatfield_mid_hi_res_pipeline
+from pyuvs.flatfield import apply_flatfield, get_matching_flatfield, \
+    get_resampled_flatfield, resample_flatfield
+
+
+class TestResampleFlatfield:
+    @pytest.fixture
+    def flatfield(self):
+        yield load_flatfield_mid_hi_res_pipeline()
+
+    def test_same_number_of_positions_returns_flatfield(self, flatfield):
+        assert np.allclose(resample_flatfield(flatfield, 133), flatfield)
+
+    def test_positions_match_column_by_column_interpolation(self, flatfield):
+        expected = np.zeros((50, 19))
+        for i in range(19):
+            expected[:, i] = np.interp(np.linspace(0, 132, num=50),
+                                       np.linspace(0, 132, num=133),
+                                       flatfield[:, i])
+        assert np.allclose(resample_flatfield(flatfield, 50), expected)
+
+    def test_wavelengths_match_row_by_row_interpolation(self, flatfield):
+        flatfield_wavelengths = np.linspace(180, 320, num=19)
+        wavelengths = np.linspace(170, 330, num=40)
+        expected = np.array([np.interp(wavelengths, flatfield_wavelengths, f)
+                             for f in flatfield])
+        resampled = resample_flatfield(flatfield, 133, wavelengths,
+                                       flatfield_wavelengths)
+        assert np.allclose(resampled, expected)
+
+    def test_wavelengths_without_flatfield_wavelengths_raises_value_error(
+            self, flatfield):
+        with pytest.raises(ValueError):
+            resample_flatfield(flatfield, 50, np.linspace(180, 320, num=19))
+
+
+class TestGetResampledFlatfield:
+    def test_unknown_flatfield_raises_value_error(self):
+        with pytest.raises(ValueError):
+            get_resampled_flatfield('foo', 50)
+
+    def test_resampled_flatfield_is_read_only(self):
+        with pytest.raises(ValueError):
+            get_resampled_flatfield('hi-res', 50)[0, 0] = 0
+
+
+class TestGetMatchingFlatfield:
+    @pytest.mark.parametrize('n_wavelengths', [15, 19])
+    def test_flatfield_matches_image_binning(self, n_wavelengths):
+        assert get_matching_flatfield(50, n_wavelengths).shape == \
+               (50, n_wavelengths)
+
+    def test_unmatched_binning_returns_none(self):
+        assert get_matching_flatfield(50, 256) is None
+
+
+class TestApplyFlatfield:
+    def test_image_is_divided_in_place(self):
+        image = np.full((3, 50, 19), 2.)
+        flatfield = np.full((50, 19), 4.)
+        apply_flatfield(image, flatfield)
+        assert np.all(image == 0.5)
+
+    def test_mismatched_shape_raises_value_error(self):
+        with pytest.raises(ValueError):
+            apply_flatfield(np.ones((3, 50, 19)), np.ones((50, 15)))
@@ -0,0 +1,67 @@
+import inspect
+import subprocess
+import sys
+import pytest
+import pyuvs
+
+
+import_time_budget: float = 1.0
+"""Maximum time [seconds] a plain ``import pyuvs`` may take."""
+
+
+class TestLazyImport:
+    @pytest.fixture
+    def import_script(self):
+        yield ('import sys, time\n'
+               't0 = time.perf_counter()\n'
+               'import pyuvs\n'
+               'print(time.perf_counter() - t0)\n'
+               'print(",".join(sorted(sys.modules)))\n')
+
+    @pytest.fixture
+    def fresh_import(self, import_script):
+        output = subprocess.run([sys.executable, '-c', import_script],
+                                capture_output=True, text=True, check=True)
+        import_time, modules = output.stdout.splitlines()
+        yield float(import_time), modules.split(',')
+
+    def test_import_is_within_time_budget(self, fresh_import):
+        assert fresh_import[0] < import_time_budget
+
+    @pytest.mark.parametrize('module', ['astropy', 'matplotlib', 'statsmodels',
+                                        'pyuvs.datafiles', 'pyuvs.graphics',
+                                        'pyuvs.spectra'])
+    def test_heavy_module_is_not_imported(self, fresh_import, module):
+        assert module not in fresh_import[1]
+
+    def test_lazy_attributes_resolve_to_their_module(self):
+        for name, module in pyuvs._lazy_attributes.items():
+            assert getattr(pyuvs, name) is \
+                getattr(getattr(pyuvs, module), name)
+
+    def test_every_spectra_function_and_class_is_exposed(self):
+        members = inspect.getmembers(
+            pyuvs.spectra,
+            lambda m: inspect.isfunction(m) or inspect.isclass(m) or
+            hasattr(m, 'cache_info'))
+        public = {name for name, member in members
+                  if not name.startswith('_') and
+                  getattr(member, '__module__', None) == 'pyuvs.spectra'}
+        assert public <= set(pyuvs._lazy_attributes)
+
+    def test_lazy_names_are_listed_by_dir(self):
+        lazy_names = {'datafiles', 'graphics',
+                      'fit_muv_templates_to_nightside_data'}
+        assert lazy_names <= set(dir(pyuvs))
+
+    def test_star_import_exports_lazy_and_eager_names(self):
+        namespace = {}
+        exec('from pyuvs import *', namespace)
+        exported = {'datafiles', 'fit_muv_templates_to_nightside_data',
+                    'SpectralScheme', 'rebin_pixels', 'kR'}
+        assert exported <= set(namespace)
+        assert 'np' not in namespace
+
+    def test_unknown_attribute_raises_attribute_error(self):
+        with pytest.raises(AttributeError):
+            pyuvs.foo
@@ -0,0 +1,70 @@
+import time
+import numpy as np
+import pytest
+from pyuvs.maps import sample_map
+
+
+class TestSampleMap:
+    @pytest.fixture
+    def latitude_map(self):
+        # Each cell holds the latitude of its center
+        yield np.repeat(np.linspace(-89.5, 89.5, num=180)[:, None], 360,
+                        axis=1)
+
+    @pytest.fixture
+    def longitude_map(self):
+        # Each cell holds the longitude of its center
+        yield np.repeat(np.linspace(0.5, 359.5, num=360)[None, :], 180,
+                        axis=0)
+
+    def test_nearest_sample_matches_cell_lookup(self, latitude_map):
+        latitude = np.array([-89.9, -10.2, 0.4, 45.6, 89.9])
+        samples = sample_map(latitude_map, latitude, np.zeros(5))
+        assert np.array_equal(samples, np.floor(latitude) + 0.5)
+
+    def test_bilinear_sample_recovers_linear_latitude(self, latitude_map):
+        latitude = np.array([[-60.3, -10.2], [20.7, 85.1]])
+        samples = sample_map(latitude_map, latitude, np.zeros((2, 2)),
+                             method='bilinear')
+        assert np.allclose(samples, latitude)
+
+    def test_longitude_wraps_around(self, longitude_map):
+        samples = sample_map(longitude_map, np.zeros(3),
+                             np.array([-0.5, 359.5, 719.5]))
+        assert np.array_equal(samples, np.array([359.5, 359.5, 359.5]))
+
+    def test_bilinear_interpolates_across_prime_meridian(self):
+        stripes = np.zeros((180, 360))
+        stripes[:, 0] = 1
+        samples = sample_map(stripes, np.array([0.]), np.array([0.]),
+                             method='bilinear')
+        assert np.allclose(samples, 0.5)
+
+    def test_decreasing_latitude_map(self, latitude_map):
+        samples = sample_map(latitude_map[::-1], np.array([30.2]),
+                             np.array([0.]), latitude_increasing=False)
+        assert np.array_equal(samples, np.array([30.5]))
+
+    def test_extra_map_axes_are_carried_along(self, latitude_map):
+        rgba = np.stack([latitude_map] * 4, axis=-1)
+        samples = sample_map(rgba, np.zeros((7, 3)), np.zeros((7, 3)),
+                             method='bilinear')
+        assert samples.shape == (7, 3, 4)
+
+    def test_non_finite_coordinates_get_fill_value(self, latitude_map):
+        samples = sample_map(latitude_map, np.array([np.nan, 0.]),
+                             np.array([0., np.nan]), method='bilinear')
+        assert np.all(np.isnan(samples))
+
+    def test_unknown_method_raises_value_error(self, latitude_map):
+        with pytest.raises(ValueError):
+            sample_map(latitude_map, np.zeros(1), np.zeros(1), method='foo')
+
+    def test_orbit_of_pixel_corners_is_sampled_quickly(self, latitude_map):
+        rng = np.random.default_rng(0)
+        shape = (2000, 133, 5)
+        latitude = rng.uniform(-90, 90, size=shape)
+        longitude = rng.uniform(0, 360, size=shape)
+        t0 = time.perf_counter()
+        sample_map(latitude_map, latitude, longitude, method='bilinear')
+        assert time.perf_counter() - t0 < 2
@@ -0,0 +1,68 @@
+from pathlib import Path
+import pytest
+from pyuvs.datafiles.path import find_latest_file_paths_from_block, \
+    find_latest_file_paths_from_blocks, \
+    find_latest_file_paths_from_orbit_range, find_latest_versions, \
+    find_outdated_file_paths
+
+
+def make_path(timestamp, version, channel='muv'):
+    return Path(f'/data/orbit03400/mvn_iuv_l1b_apoapse-orbit03453-{channel}_'
+                f'{timestamp}_{version}.fits.gz')
+
+
+class TestFindLatestVersions:
+    @pytest.fixture
+    def files(self):
+        yield [make_path('20160708T004652', 'v13_s02'),
+               make_path('20160708T004652', 'v13_r01'),
+               make_path('20160708T014652', 'v9_r01'),
+               make_path('20160708T014652', 'v10_s01'),
+               make_path('20160708T014652', 'v10_s01', channel='fuv'),
+               make_path('20160708T024652', 'v13_r02'),
+               make_path('20160708T024652', 'v13_r10')]
+
+    def test_latest_version_and_revision_of_each_observation_is_kept(
+            self, files):
+        assert find_latest_versions(files) == [files[1], files[3], files[4],
+                                               files[6]]
+
+    def test_result_does_not_depend_on_file_order(self, files):
+        assert set(find_latest_versions(files[::-1])) == \
+            set(find_latest_versions(files))
+
+    def test_outdated_files_are_the_other_files(self, files):
+        assert find_outdated_file_paths(files) == [files[0], files[2],
+                                                   files[5]]
+
+
+class TestFindLatestFilePathsFromBlocks:
+    @pytest.fixture
+    def data_directory(self, tmp_path):
+        for orbit in [3398, 3399, 3400, 3401, 3405]:
+            block = tmp_path / f'orbit0{orbit // 100 * 100}'
+            block.mkdir(exist_ok=True)
+            for description in [f'apoapse-orbit0{orbit}-muv',
+                                f'apoapse-orbit0{orbit}-fuv',
+                                f'periapse-orbit0{orbit}-muv']:
+                for version in ['v13_r01', 'v13_s02']:
+                    (block / f'mvn_iuv_l1b_{description}_20160708T004652_'
+                             f'{version}.fits.gz').touch()
+        (tmp_path / 'orbit03400' / 'notes.txt').touch()
+        yield tmp_path
+
+    def test_each_orbit_matches_single_block_search(self, data_directory):
+        files = find_latest_file_paths_from_blocks(
+            data_directory, 'apoapse', [3399, 3400, 3401, 3405], 'muv',
+            n_workers=2)
+        for orbit, orbit_files in files.items():
+            assert len(orbit_files) == 1
+            assert orbit_files == find_latest_file_paths_from_block(
+                data_directory, 'apoapse', orbit, 'muv')
+
+    def test_orbit_range_excludes_end_and_has_empty_orbits(
+            self, data_directory):
+        files = find_latest_file_paths_from_orbit_range(
+            data_directory, 'apoapse', 3398, 3403, 'fuv')
+        assert list(files) == [3398, 3399, 3400, 3401, 3402]
+        assert [len(f) for f in files.values()] == [1, 1, 1, 1, 0]
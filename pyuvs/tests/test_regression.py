@@ -0,0 +1,212 @@
+import numpy as np
+import pytest
+import statsmodels.api as sm
+from scipy.optimize import lsq_linear
+from pyuvs.regression import RobustLeastSquaresFit, \
+    SharedWeightsFactorization, WeightedLeastSquaresFit, \
+    solve_weighted_least_squares
+
+
+class TestSolveWeightedLeastSquares:
+    @pytest.fixture
+    def design(self):
+        x = np.linspace(-1, 1, num=40)
+        yield np.column_stack([np.ones(40), x, 1000 * x ** 2])
+
+    @pytest.fixture
+    def data(self, design):
+        rng = np.random.default_rng(0)
+        coefficients = rng.uniform(-5, 5, size=(6, 5, 3))
+        yield coefficients @ design.T + rng.normal(size=(6, 5, 40))
+
+    @pytest.fixture
+    def weights(self, data):
+        yield 1 / (1 + np.abs(data))
+
+    def test_coefficients_match_statsmodels(self, data, design, weights):
+        data[2, 3, [0, 7, 8]] = np.nan
+        coefficients = solve_weighted_least_squares(data, design, weights)
+        for f in range(data.shape[0]):
+            for g in range(data.shape[1]):
+                expected = sm.WLS(data[f, g], design, weights=weights[f, g],
+                                  missing='drop').fit().params
+                assert np.allclose(coefficients[f, g], expected, rtol=1e-10)
+
+    def test_per_fit_design_matches_shared_design(self, data, design,
+                                                  weights):
+        shared = solve_weighted_least_squares(data, design, weights)
+        per_fit = solve_weighted_least_squares(
+            data, np.broadcast_to(design, data.shape + (3,)), weights)
+        assert np.allclose(shared, per_fit, rtol=1e-10)
+
+    def test_non_finite_weights_drop_samples(self, data, design, weights):
+        weights[0, 0, 4] = np.inf
+        coefficients = solve_weighted_least_squares(data, design, weights)
+        expected = solve_weighted_least_squares(
+            np.delete(data[0, 0], 4), np.delete(design, 4, axis=0),
+            np.delete(weights[0, 0], 4))
+        assert np.allclose(coefficients[0, 0], expected)
+
+    def test_underdetermined_fit_is_nan(self, data, design, weights):
+        data[1, 1, 2:] = np.nan
+        coefficients = solve_weighted_least_squares(data, design, weights)
+        assert np.all(np.isnan(coefficients[1, 1]))
+        assert np.all(np.isfinite(coefficients[0, 0]))
+
+
+class TestWeightedLeastSquaresFit:
+    @pytest.fixture
+    def design(self):
+        x = np.linspace(-1, 1, num=40)
+        yield np.column_stack([np.ones(40), x, x ** 2])
+
+    @pytest.fixture
+    def data(self, design):
+        rng = np.random.default_rng(1)
+        coefficients = rng.uniform(-5, 5, size=(4, 3, 3))
+        data = coefficients @ design.T + rng.normal(size=(4, 3, 40))
+        data[1, 2, [3, 30]] = np.nan
+        yield data
+
+    @pytest.fixture
+    def weights(self, data):
+        yield 1 / (1 + np.abs(np.nan_to_num(data)))
+
+    def test_statistics_match_statsmodels(self, data, design, weights):
+        fit = WeightedLeastSquaresFit(data, design, weights)
+        for f in range(data.shape[0]):
+            for g in range(data.shape[1]):
+                expected = sm.WLS(data[f, g], design, weights=weights[f, g],
+                                  missing='drop').fit()
+                assert np.allclose(fit.covariance[f, g],
+                                   expected.cov_params(), rtol=1e-8)
+                assert np.allclose(fit.standard_errors[f, g], expected.bse,
+                                   rtol=1e-8)
+                assert np.isclose(fit.reduced_chi_squared[f, g],
+                                  expected.scale, rtol=1e-8)
+                assert np.isclose(fit.r_squared[f, g], expected.rsquared,
+                                  rtol=1e-8)
+
+    def test_dropped_samples_have_nan_residuals(self, data, design, weights):
+        residuals = WeightedLeastSquaresFit(data, design, weights).residuals
+        assert np.array_equal(np.isnan(residuals), np.isnan(data))
+
+    def test_nonnegative_coefficients_match_bounded_least_squares(
+            self, data, design, weights):
+        rng = np.random.default_rng(2)
+        data = rng.uniform(-3, 3, size=(20, 3)) @ design.T + \
+            rng.normal(size=(20, 40))
+        weights = rng.uniform(0.5, 2, size=data.shape)
+        fit = WeightedLeastSquaresFit(data, design, weights,
+                                      nonnegative=[False, True, True])
+        assert np.any(fit.coefficients[:, 1:] == 0)
+        for spectrum, weight, coefficients in \
+                zip(data, weights, fit.coefficients):
+            root_weight = np.sqrt(weight)
+            expected = lsq_linear(design * root_weight[:, None],
+                                  spectrum * root_weight,
+                                  bounds=([-np.inf, 0, 0], np.inf),
+                                  tol=1e-12).x
+            assert np.allclose(coefficients, expected, atol=1e-8)
+
+    def test_too_many_nonnegative_parameters_raises_value_error(self):
+        design = np.random.default_rng(0).uniform(size=(40, 9))
+        with pytest.raises(ValueError):
+            WeightedLeastSquaresFit(np.ones(40), design, 1,
+                                    nonnegative=np.ones(9, dtype=bool))
+
+    def test_nonnegative_fit_of_nonnegative_solution_is_unchanged(
+            self, data, design, weights):
+        data = np.abs(data[..., :1]) + design @ [1, 2, 3]
+        fit = WeightedLeastSquaresFit(data, design, weights)
+        constrained = WeightedLeastSquaresFit(data, design, weights,
+                                              nonnegative=[True, True, True])
+        assert np.allclose(constrained.coefficients, fit.coefficients)
+
+    def test_shared_weights_match_per_fit_weights(self, data, design,
+                                                  weights):
+        shared_weights = weights[:, :1, :]
+        shared = WeightedLeastSquaresFit(data, design, shared_weights)
+        per_fit = WeightedLeastSquaresFit(
+            data, design, np.broadcast_to(shared_weights, data.shape).copy())
+        assert np.allclose(shared.coefficients, per_fit.coefficients,
+                           rtol=1e-10, equal_nan=True)
+        assert np.allclose(shared.standard_errors, per_fit.standard_errors,
+                           rtol=1e-10, equal_nan=True)
+
+    def test_factorization_is_reused(self, data, design):
+        weights = np.ones(40)
+        weights[:5] = 0
+        factorization = SharedWeightsFactorization(design, weights)
+        fit = WeightedLeastSquaresFit(data, design, weights,
+                                      factorization=factorization)
+        expected = WeightedLeastSquaresFit(
+            data, design, np.broadcast_to(weights, data.shape).copy())
+        assert np.allclose(fit.coefficients, expected.coefficients,
+                           rtol=1e-10)
+
+
+class TestRobustLeastSquaresFit:
+    @pytest.fixture
+    def design(self):
+        x = np.linspace(0, 1, num=40)
+        yield np.column_stack([np.ones(40), x, x ** 2])
+
+    @pytest.fixture
+    def data(self, design):
+        rng = np.random.default_rng(0)
+        coefficients = rng.uniform(-5, 5, size=(3, 2, 3))
+        data = coefficients @ design.T + rng.normal(size=(3, 2, 40))
+        data[..., [3, 17]] += 30
+        yield data
+
+    @pytest.mark.parametrize('norm, statsmodels_norm', [
+        ('huber', sm.robust.norms.HuberT()),
+        ('tukey', sm.robust.norms.TukeyBiweight())])
+    def test_coefficients_match_statsmodels(self, data, design, norm,
+                                            statsmodels_norm):
+        fit = RobustLeastSquaresFit(data, design, 1, norm=norm,
+                                    tolerance=1e-12)
+        for f in range(data.shape[0]):
+            for g in range(data.shape[1]):
+                expected = sm.RLM(data[f, g], design, M=statsmodels_norm)\
+                    .fit(conv='coefs', tol=1e-12).params
+                assert np.allclose(fit.coefficients[f, g], expected,
+                                   rtol=1e-9)
+
+    def test_outliers_have_small_robust_weights(self, data, design):
+        fit = RobustLeastSquaresFit(data, design, 1, norm='tukey')
+        assert np.all(fit.robust_weights[..., [3, 17]] == 0)
+        assert np.all(fit.converged)
+
+    @pytest.mark.parametrize('norm', ['huber', 'tukey'])
+    def test_final_state_is_weighted_fit_with_robust_weights(self, data,
+                                                             design, norm):
+        data[1, 0, 5] = np.nan
+        fit = RobustLeastSquaresFit(data, design, 1, norm=norm)
+        expected = WeightedLeastSquaresFit(data, design, fit.robust_weights)
+        assert np.allclose(fit.coefficients, expected.coefficients)
+        assert np.allclose(fit.covariance, expected.covariance)
+        assert np.allclose(fit.residuals, expected.residuals, equal_nan=True)
+
+    def test_fits_drop_out_once_converged(self, data, design):
+        data[0, 0] = design @ [1, 2, 3]
+        fit = RobustLeastSquaresFit(data, design, 1)
+        assert fit.n_iterations[0, 0] == 1
+        assert np.all(fit.n_iterations[1:] > 1)
+
+    def test_unconverged_fits_are_flagged(self, data, design):
+        fit = RobustLeastSquaresFit(data, design, 1, max_iterations=2)
+        assert np.all(fit.n_iterations == 2)
+        assert not np.any(fit.converged)
+
+    def test_failed_fits_are_not_converged(self, data, design):
+        data[1, 0] = np.nan
+        fit = RobustLeastSquaresFit(data, design, 1)
+        assert np.all(np.isnan(fit.coefficients[1, 0]))
+        assert not fit.converged[1, 0]
+        assert fit.converged[0, 0]
+
+    def test_unknown_norm_raises_value_error(self, data, design):
+        with pytest.raises(ValueError):
+            RobustLeastSquaresFit(data, design, 1, norm='foo')
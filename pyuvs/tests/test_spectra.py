@@ -0,0 +1,450 @@
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from pyuvs.anc import load_muv_sensitivity_curve_observational
+from pyuvs.constants import kR, pixel_omega
+from pyuvs.spectra import SpectralScheme, get_spectral_scheme, \
+    calculate_calibration_curve, convolve_templates, find_saturated_bins, \
+    fit_muv_templates_to_nightside_data, \
+    fit_muv_templates_to_nightside_files, get_binning_spectral_scheme, \
+    get_muv_calibration_curve, get_psf_convolved_templates, \
+    get_shifted_template_bank, load_standard_fit_templates, \
+    rebin_muv_wavelengths, rebin_templates, \
+    refit_muv_templates_to_nightside_data, _get_psf_convolved_templates, \
+    _make_muv_calibration_curve
+
+
+class TestSpectralScheme:
+    def test_templates_span_full_scheme(self):
+        assert SpectralScheme(4, 20, 200).templates.shape == (4, 256)
+
+    def test_wavelength_widths_sum_to_detector_width(self):
+        narrow = SpectralScheme(1, 0, 1024).wavelength_widths
+        wide = SpectralScheme(8, 0, 128).wavelength_widths
+        assert np.isclose(np.sum(narrow), np.sum(wide))
+
+    def test_wavelength_centers_match_rebinned_wavelengths(self):
+        assert np.array_equal(SpectralScheme(2, 0, 512).wavelength_centers,
+                              rebin_muv_wavelengths(2))
+
+    def test_products_are_read_only(self):
+        with pytest.raises(ValueError):
+            SpectralScheme(4, 20, 200).sensitivity_curve[0] = 0
+
+    def test_transmitted_bins_outside_scheme_raises_value_error(self):
+        with pytest.raises(ValueError):
+            SpectralScheme(4, 200, 100)
+
+    def test_persisted_products_match_computed_products(self, tmp_path):
+        computed = SpectralScheme(4, 20, 200, cache_directory=tmp_path)
+        loaded = SpectralScheme(4, 20, 200, cache_directory=tmp_path)
+        assert len(list(tmp_path.iterdir())) == 1
+        assert np.array_equal(computed.templates, loaded.templates)
+        assert np.array_equal(computed.sensitivity_curve,
+                              loaded.sensitivity_curve)
+
+    def test_binning_scheme_excludes_keyhole_bins(self):
+        low = np.concatenate([[0], np.arange(80, 880, 4), [880]])
+        high = np.concatenate([[79], np.arange(83, 883, 4), [1023]])
+        binning = SimpleNamespace(spectral_pixel_low=low[None, :],
+                                  spectral_pixel_high=high[None, :])
+        assert get_binning_spectral_scheme(binning) is \
+            get_spectral_scheme(4, 20, 200)
+
+    def test_binning_scheme_excludes_keyhole_bins_of_median_width(self):
+        low = np.concatenate([[76], np.arange(80, 880, 4), [880]])
+        high = np.concatenate([[79], np.arange(83, 883, 4), [883]])
+        binning = SimpleNamespace(spectral_pixel_low=low[None, :],
+                                  spectral_pixel_high=high[None, :])
+        assert get_binning_spectral_scheme(binning) is \
+            get_spectral_scheme(4, 20, 200)
+
+    def test_uneven_binning_raises_value_error(self):
+        low = np.concatenate([[0], np.arange(80, 880, 4), [882, 890]])
+        high = np.concatenate([[79], np.arange(83, 883, 4), [889, 1023]])
+        binning = SimpleNamespace(spectral_pixel_low=low[None, :],
+                                  spectral_pixel_high=high[None, :])
+        with pytest.raises(ValueError):
+            get_binning_spectral_scheme(binning)
+
+    def test_scheme_is_memoized(self):
+        assert get_spectral_scheme(4, 20, 200) is \
+            get_spectral_scheme(4, 20, 200)
+
+
+class TestGetMuvCalibrationCurve:
+    def test_curve_matches_calibration_curve_of_scheme(self):
+        scheme = get_spectral_scheme(4, 20, 200)
+        expected = calculate_calibration_curve(
+            scheme.sensitivity_curve, 2, scheme.wavelength_widths, 700, 4.8)
+        curve = get_muv_calibration_curve(2, 4, 20, 200, 700, 4.8)
+        assert np.array_equal(curve, expected)
+
+    def test_2d_curve_matches_legacy_per_position_loop(self):
+        scheme = get_spectral_scheme(4, 20, 200)
+        sensitivity = load_muv_sensitivity_curve_observational()
+        wavelengths = scheme.wavelength_centers + \
+            np.linspace(-2, 2, num=50)[:, None]
+        expected = np.zeros((50, 256))
+        for position in range(50):
+            line_effective_area = np.array(
+                [np.interp(i, sensitivity[:, 0], sensitivity[:, 1])
+                 for i in wavelengths[position]])
+            expected[position] = scheme.wavelength_widths * 700 * 4.8 * kR * \
+                line_effective_area * pixel_omega * 2
+        curve = get_muv_calibration_curve(2, 4, 20, 200, 700, 4.8,
+                                          wavelengths)
+        assert np.allclose(curve, expected)
+
+    def test_scalar_wavelength_width_matches_calibration_curve(self):
+        scheme = get_spectral_scheme(4, 20, 200)
+        expected = calculate_calibration_curve(
+            scheme.sensitivity_curve, 2, 0.65, 700, 4.8)
+        curve = get_muv_calibration_curve(2, 4, 20, 200, 700, 4.8,
+                                          wavelength_width=0.65)
+        assert np.array_equal(curve, expected)
+
+    def test_mismatched_wavelengths_raises_value_error(self):
+        with pytest.raises(ValueError):
+            get_muv_calibration_curve(2, 4, 20, 200, 700, 4.8,
+                                      np.ones((50, 19)))
+
+    def test_float32_curve_is_close_to_float64_curve(self):
+        curve = get_muv_calibration_curve(2, 4, 20, 200, 700, 4.8)
+        single = get_muv_calibration_curve(2, 4, 20, 200, 700, 4.8,
+                                           dtype='float32')
+        assert single.dtype == np.float32
+        assert np.allclose(single, curve, rtol=1e-6)
+
+    def test_equivalent_settings_share_a_curve(self):
+        assert get_muv_calibration_curve(2, 4, 20, 200, 700, 4.8) is \
+            get_muv_calibration_curve(2.0, 4, 20, 200, 700.0, 4.8)
+
+    def test_curve_is_read_only(self):
+        with pytest.raises(ValueError):
+            get_muv_calibration_curve(2, 4, 20, 200, 700, 4.8)[0] = 0
+
+
+class TestConvolveTemplates:
+    def test_convolution_matches_direct_convolution(self):
+        rng = np.random.default_rng(0)
+        templates = rng.uniform(size=(3, 100))
+        kernel = np.array([1, 2, 4, 2, 1]) / 10
+        expected = [np.convolve(template, kernel, mode='same')
+                    for template in templates]
+        assert np.allclose(convolve_templates(templates, kernel), expected)
+
+
+class TestGetPsfConvolvedTemplates:
+    def test_templates_are_rebinned_convolved_templates(self):
+        templates = load_standard_fit_templates()
+        assert np.allclose(
+            get_psf_convolved_templates(4),
+            rebin_templates(convolve_templates(templates), 4))
+
+    def test_equal_template_sets_share_convolved_templates(self):
+        templates = load_standard_fit_templates()
+        assert get_psf_convolved_templates(4, templates.copy()) is \
+            get_psf_convolved_templates(4)
+
+    def test_cache_is_bounded(self):
+        assert _get_psf_convolved_templates.cache_info().maxsize is not None
+
+    def test_persisted_templates_match_computed_templates(self, tmp_path):
+        templates = np.random.default_rng(0).uniform(size=(2, 1024))
+        computed = get_psf_convolved_templates(
+            8, templates, cache_directory=tmp_path)
+        assert len(list(tmp_path.iterdir())) == 1
+        path = next(tmp_path.iterdir())
+        assert np.array_equal(np.load(path), computed)
+        with pytest.raises(ValueError):
+            computed[0, 0] = 0
+
+
+class TestGetShiftedTemplateBank:
+    def test_zero_shift_matches_scheme_templates(self):
+        assert np.allclose(get_shifted_template_bank(4)[100],
+                           get_spectral_scheme(4, 20, 200).templates)
+
+    def test_whole_pixel_shift_moves_templates(self):
+        bank = get_shifted_template_bank(1)
+        assert np.allclose(bank[120, :, 1:], bank[100, :, :-1])
+
+    def test_bank_is_memoized_and_read_only(self):
+        bank = get_shifted_template_bank(4)
+        assert bank is get_shifted_template_bank(4)
+        with pytest.raises(ValueError):
+            bank[0, 0, 0] = 0
+
+
+class TestFitMuvTemplatesToNightsideData:
+    @pytest.fixture
+    def spectra(self):
+        rng = np.random.default_rng(0)
+        templates = get_spectral_scheme(4, 20, 200).templates[:, 20:220]
+        coefficients = rng.uniform(0.5, 5, size=(4, 3, 4))
+        data = coefficients @ templates + 3 + rng.normal(size=(4, 3, 200))
+        data[0, 0, 5] = np.nan
+        yield data
+
+    def test_batched_engine_matches_statsmodels_engine(self, spectra):
+        uncertainty = np.sqrt(np.abs(spectra)) + 1
+        batched = fit_muv_templates_to_nightside_data(
+            spectra, uncertainty, 0.65, 8, 4, 20, 10, 4)
+        reference = fit_muv_templates_to_nightside_data(
+            spectra, uncertainty, 0.65, 8, 4, 20, 10, 4,
+            engine='statsmodels')
+        assert batched.shape == (3, 4, 3)
+        assert np.allclose(batched, reference, rtol=1e-9)
+
+    def test_full_output_statistics_match_statsmodels_engine(self, spectra):
+        uncertainty = np.sqrt(np.abs(spectra)) + 1
+        batched = fit_muv_templates_to_nightside_data(
+            spectra, uncertainty, 0.65, 8, 4, 20, 10, 4, full_output=True)
+        reference = fit_muv_templates_to_nightside_data(
+            spectra, uncertainty, 0.65, 8, 4, 20, 10, 4,
+            engine='statsmodels', full_output=True)
+        assert np.allclose(batched[0], reference[0], rtol=1e-9)
+        for name, statistic in reference[1].items():
+            assert batched[1][name].shape == statistic.shape
+            assert np.allclose(batched[1][name], statistic, rtol=1e-7)
+
+    def test_brightness_uncertainty_matches_standard_errors(self, spectra):
+        # The NO brightness only depends on one coefficient
+        brightnesses, statistics = fit_muv_templates_to_nightside_data(
+            spectra, np.ones(spectra.shape), 0.65, 8, 4, 20, 10, 4,
+            full_output=True)
+        ratio = brightnesses[0] / statistics['coefficients'][..., 1]
+        assert np.allclose(statistics['brightness_uncertainty'][0],
+                           np.abs(ratio) *
+                           statistics['standard_errors'][..., 1])
+
+    def test_nonnegative_fit_has_nonnegative_coefficients(self, spectra):
+        noisy = spectra + np.random.default_rng(1).normal(
+            scale=30, size=spectra.shape)
+        brightnesses, statistics = fit_muv_templates_to_nightside_data(
+            noisy, np.ones(spectra.shape), 0.65, 8, 4, 20, 10, 4,
+            nonnegative=True, full_output=True)
+        assert np.all(statistics['coefficients'][..., 1:] >= 0)
+        assert np.all(np.isfinite(brightnesses))
+
+    def test_nonnegative_statsmodels_fit_raises_value_error(self, spectra):
+        with pytest.raises(ValueError):
+            fit_muv_templates_to_nightside_data(
+                spectra, np.ones(spectra.shape), 0.65, 8, 4, 20, 10, 4,
+                engine='statsmodels', nonnegative=True)
+
+    @pytest.mark.parametrize('executor', ['thread', 'process'])
+    def test_chunked_fit_does_not_depend_on_chunking(self, spectra,
+                                                     executor):
+        uncertainty = np.sqrt(np.abs(spectra)) + 1
+        expected = fit_muv_templates_to_nightside_data(
+            spectra, uncertainty, 0.65, 8, 4, 20, 10, 4, full_output=True)
+        chunked = fit_muv_templates_to_nightside_data(
+            spectra, uncertainty, 0.65, 8, 4, 20, 10, 4, full_output=True,
+            n_workers=2, chunk_size=1, executor=executor)
+        assert np.array_equal(chunked[0], expected[0])
+        for name, statistic in expected[1].items():
+            assert np.array_equal(chunked[1][name], statistic)
+
+    def test_spatially_shared_uncertainty_matches_full_uncertainty(
+            self, spectra):
+        uncertainty = np.sqrt(np.abs(np.nanmean(spectra, axis=1,
+                                                keepdims=True))) + 1
+        shared = fit_muv_templates_to_nightside_data(
+            spectra, uncertainty, 0.65, 8, 4, 20, 10, 4)
+        full = fit_muv_templates_to_nightside_data(
+            spectra, np.broadcast_to(uncertainty, spectra.shape).copy(), 0.65,
+            8, 4, 20, 10, 4)
+        assert np.allclose(shared, full, rtol=1e-10)
+
+    def test_no_uncertainty_matches_unit_uncertainty(self, spectra):
+        uniform = fit_muv_templates_to_nightside_data(
+            spectra, None, 0.65, 8, 4, 20, 10, 4, n_workers=2)
+        unit = fit_muv_templates_to_nightside_data(
+            spectra, np.ones(spectra.shape), 0.65, 8, 4, 20, 10, 4)
+        assert np.allclose(uniform, unit, rtol=1e-10)
+
+    def test_zero_pixel_shift_matches_unshifted_fit(self, spectra):
+        uncertainty = np.sqrt(np.abs(spectra)) + 1
+        unshifted = fit_muv_templates_to_nightside_data(
+            spectra, uncertainty, 0.65, 8, 4, 20, 10, 4)
+        shifted = fit_muv_templates_to_nightside_data(
+            spectra, uncertainty, 0.65, 8, 4, 20, 10, 4,
+            pixel_shift=np.zeros(spectra.shape[0]))
+        assert np.allclose(shifted, unshifted, rtol=1e-10)
+
+    def test_pixel_shift_fits_shifted_spectra(self):
+        rng = np.random.default_rng(0)
+        pixel_shift = np.array([-2, -0.5, 0.25, 1.5])
+        bank = get_shifted_template_bank(4)
+        templates = bank[np.rint((pixel_shift + 5) / 0.05).astype(int)]
+        coefficients = rng.uniform(0.5, 5, size=(4, 3, 4))
+        spectra = coefficients @ templates[..., 20:220] + 3
+        unshifted, unshifted_statistics = fit_muv_templates_to_nightside_data(
+            spectra, None, 0.65, 8, 4, 20, 10, 4, full_output=True)
+        shifted, statistics = fit_muv_templates_to_nightside_data(
+            spectra, None, 0.65, 8, 4, 20, 10, 4, full_output=True,
+            pixel_shift=pixel_shift, n_workers=2, chunk_size=3)
+        assert np.allclose(statistics['coefficients'][..., 1:], coefficients)
+        assert np.all(statistics['reduced_chi_squared'] <
+                      unshifted_statistics['reduced_chi_squared'])
+
+    def test_psf_convolved_fit_recovers_convolved_templates(self):
+        rng = np.random.default_rng(0)
+        templates = get_psf_convolved_templates(4)[:, 20:220]
+        coefficients = rng.uniform(0.5, 5, size=(4, 3, 4))
+        spectra = coefficients @ templates + 3
+        _, statistics = fit_muv_templates_to_nightside_data(
+            spectra, None, 0.65, 8, 4, 20, 10, 4, full_output=True,
+            convolve_psf=True)
+        shifted, shifted_statistics = fit_muv_templates_to_nightside_data(
+            spectra, np.ones(spectra.shape), 0.65, 8, 4, 20, 10, 4,
+            full_output=True, convolve_psf=True,
+            pixel_shift=np.zeros(spectra.shape[0]))
+        assert np.allclose(statistics['coefficients'][..., 1:], coefficients)
+        assert np.allclose(shifted_statistics['coefficients'],
+                           statistics['coefficients'])
+
+    def test_robust_fit_ignores_cosmic_rays(self, spectra):
+        uncertainty = np.sqrt(np.abs(spectra)) + 1
+        expected = fit_muv_templates_to_nightside_data(
+            spectra, uncertainty, 0.65, 8, 4, 20, 10, 4)
+        spectra[..., 50] += 1000
+        contaminated = fit_muv_templates_to_nightside_data(
+            spectra, uncertainty, 0.65, 8, 4, 20, 10, 4)
+        brightnesses, statistics = fit_muv_templates_to_nightside_data(
+            spectra, uncertainty, 0.65, 8, 4, 20, 10, 4, robust='tukey',
+            full_output=True, n_workers=2, chunk_size=3)
+        assert np.max(np.abs(brightnesses - expected)) < \
+            0.1 * np.max(np.abs(contaminated - expected))
+        assert np.all(statistics['converged'])
+        assert np.all(statistics['n_iterations'] > 0)
+
+    def test_robust_statsmodels_fit_raises_value_error(self, spectra):
+        with pytest.raises(ValueError):
+            fit_muv_templates_to_nightside_data(
+                spectra, None, 0.65, 8, 4, 20, 10, 4, engine='statsmodels',
+                robust='huber')
+
+    @pytest.mark.parametrize('kwargs', [
+        {'executor': 'foo'}, {'n_workers': 2, 'executor': 'foo'},
+        {'n_workers': 0}, {'chunk_size': 0}])
+    def test_invalid_chunking_raises_value_error(self, spectra, kwargs):
+        with pytest.raises(ValueError):
+            fit_muv_templates_to_nightside_data(
+                spectra, np.ones(spectra.shape), 0.65, 8, 4, 20, 10, 4,
+                **kwargs)
+
+    def test_process_fit_of_shared_uncertainty_matches_serial_fit(
+            self, spectra):
+        uncertainty = np.sqrt(np.abs(np.nanmean(spectra, axis=(0, 1)))) + 1
+        expected = fit_muv_templates_to_nightside_data(
+            spectra, uncertainty, 0.65, 8, 4, 20, 10, 4)
+        chunked = fit_muv_templates_to_nightside_data(
+            spectra, uncertainty, 0.65, 8, 4, 20, 10, 4, n_workers=2,
+            chunk_size=1, executor='process')
+        assert np.array_equal(chunked, expected)
+
+    def test_unknown_engine_raises_value_error(self, spectra):
+        with pytest.raises(ValueError):
+            fit_muv_templates_to_nightside_data(
+                spectra, np.ones(spectra.shape), 0.65, 8, 4, 20, 10, 4,
+                engine='foo')
+
+
+class TestRefitMuvTemplatesToNightsideData:
+    @pytest.fixture
+    def spectra(self):
+        rng = np.random.default_rng(0)
+        templates = get_spectral_scheme(4, 20, 200).templates[:, 20:220]
+        coefficients = rng.uniform(0.5, 5, size=(4, 3, 4))
+        yield coefficients @ templates + 3 + rng.normal(size=(4, 3, 200))
+
+    @pytest.fixture
+    def refit(self):
+        refit = np.zeros((4, 3), dtype=bool)
+        refit[[0, 2, 3], [1, 1, 0]] = True
+        yield refit
+
+    def test_refit_matches_full_fit(self, spectra, refit):
+        uncertainty = np.sqrt(np.abs(spectra)) + 1
+        previous = fit_muv_templates_to_nightside_data(
+            spectra, uncertainty, 0.65, 8, 4, 20, 10, 4, full_output=True)
+        spectra[refit, 30:40] = np.nan
+        expected = fit_muv_templates_to_nightside_data(
+            spectra, uncertainty, 0.65, 8, 4, 20, 10, 4, full_output=True)
+        brightnesses, statistics = refit_muv_templates_to_nightside_data(
+            previous, refit, spectra, uncertainty, 0.65, 8, 4, 20, 10, 4)
+        assert np.allclose(brightnesses, expected[0], rtol=1e-10)
+        for name, statistic in expected[1].items():
+            assert np.allclose(statistics[name], statistic, rtol=1e-8)
+        assert np.array_equal(statistics['refit'], refit)
+
+    def test_other_spectra_are_not_refit(self, spectra, refit):
+        previous = fit_muv_templates_to_nightside_data(
+            spectra, None, 0.65, 8, 4, 20, 10, 4)
+        brightnesses, statistics = refit_muv_templates_to_nightside_data(
+            previous, refit, np.full(spectra.shape, np.nan), None, 0.65, 8,
+            4, 20, 10, 4)
+        assert np.array_equal(brightnesses[:, ~refit], previous[:, ~refit])
+        assert np.all(np.isnan(brightnesses[:, refit]))
+        assert list(statistics) == ['refit']
+
+    def test_mismatched_statistics_raise_value_error(self, spectra, refit):
+        previous = fit_muv_templates_to_nightside_data(
+            spectra, None, 0.65, 8, 4, 20, 10, 4, full_output=True)
+        with pytest.raises(ValueError):
+            refit_muv_templates_to_nightside_data(
+                previous, refit, spectra, None, 0.65, 8, 4, 20, 10, 4,
+                robust='huber')
+
+    def test_saturated_bins_exceed_binned_well_depth(self):
+        image = np.array([3400 * 32 - 1, 3400 * 32])
+        assert np.array_equal(find_saturated_bins(image, 8, 4),
+                              [False, True])
+
+
+class TestFitMuvTemplatesToNightsideFiles:
+    @pytest.fixture
+    def files(self):
+        # These stand in for L1bFiles with 4 pixels / spectral bin starting at
+        # bin 20, keyhole bins on either side, and 8 pixels / spatial bin
+        rng = np.random.default_rng(0)
+        templates = get_spectral_scheme(4, 20, 200).templates[:, 20:220]
+        files = []
+        for n_integrations in [3, 5]:
+            coefficients = rng.uniform(0.5, 5, size=(n_integrations, 2, 4))
+            image = coefficients @ templates + 3 + \
+                rng.normal(size=(n_integrations, 2, 200))
+            files.append(SimpleNamespace(
+                detector_image=SimpleNamespace(
+                    dark_subtracted=image,
+                    random_uncertainty_dn=np.sqrt(np.abs(image)) + 1),
+                binning=SimpleNamespace(
+                    spectral_pixel_low=np.concatenate(
+                        [[0], np.arange(80, 880, 4), [880]])[None, :],
+                    spectral_pixel_high=np.concatenate(
+                        [[79], np.arange(83, 883, 4), [1023]])[None, :],
+                    spatial_pixel_bin_width=np.array([8, 8])),
+                observation=SimpleNamespace(
+                    wavelength_width=np.full(200, 0.65), voltage_gain=10,
+                    integration_time=4)))
+        yield files
+
+    def test_files_share_a_cached_calibration_curve(self, files):
+        _make_muv_calibration_curve.cache_clear()
+        list(fit_muv_templates_to_nightside_files(iter(files)))
+        info = _make_muv_calibration_curve.cache_info()
+        assert (info.hits, info.misses) == (1, 1)
+
+    def test_each_file_matches_fitting_its_image(self, files):
+        results = list(fit_muv_templates_to_nightside_files(iter(files)))
+        assert len(results) == 2
+        for file, (streamed_file, brightnesses) in zip(files, results):
+            expected = fit_muv_templates_to_nightside_data(
+                file.detector_image.dark_subtracted,
+                file.detector_image.random_uncertainty_dn, 0.65, 8, 4, 20, 10,
+                4)
+            assert streamed_file is file
+            assert np.array_equal(brightnesses, expected)
@@ -1,6 +1,8 @@
+import json
 import numpy as np
 import pytest
-from pyuvs.swath import swath_number
+from pyuvs.swath import SwathSegmenter, grouped_swath_number, \
+    swath_number
 
 
 class TestSwathNumber:
@@ -43,3 +45,82 @@ class TestSwathNumber:
 
     def test_single_integration_returns_array_of_0(self):
         assert np.array_equal(swath_number(np.array([100])), np.array([0]))
+
+
+class TestGroupedSwathNumber:
+    @pytest.fixture
+    def segments(self):
+        rng = np.random.default_rng(0)
+        yield [np.concatenate([
+            np.linspace(rng.uniform(30, 40), rng.uniform(50, 60),
+                        num=rng.integers(5, 60))
+            for _ in range(rng.integers(1, 6))]) for _ in range(20)]
+
+    def test_each_segment_matches_swath_number(self, segments):
+        segment_ids = np.concatenate([np.full(segment.shape, f * 3)
+                                      for f, segment in enumerate(segments)])
+        swath_numbers = grouped_swath_number(np.concatenate(segments),
+                                             segment_ids)
+        assert np.array_equal(
+            swath_numbers,
+            np.concatenate([swath_number(f) for f in segments]))
+
+    def test_interleaved_segments_match_contiguous_segments(self, segments):
+        mirror_angles = np.concatenate(segments[:2])
+        segment_ids = np.repeat([0, 1], [segments[0].shape[0],
+                                         segments[1].shape[0]])
+        expected = grouped_swath_number(mirror_angles, segment_ids)
+        order = np.argsort(np.concatenate(
+            [np.arange(segments[0].shape[0]),
+             np.arange(segments[1].shape[0]) + 0.5]))
+        assert np.array_equal(
+            grouped_swath_number(mirror_angles[order], segment_ids[order]),
+            expected[order])
+
+    def test_single_integration_segment_is_swath_0(self):
+        assert np.array_equal(
+            grouped_swath_number(np.array([40, 41, 30, 31, 80]),
+                                 np.array([1, 1, 1, 1, 2])),
+            [0, 0, 1, 1, 0])
+
+
+class TestSwathSegmenter:
+    @pytest.fixture
+    def files(self):
+        # Each swath is split across 2 files
+        mirror_angles = np.linspace(70, 110, num=50)
+        yield [mirror_angles[:20], mirror_angles[20:]] * 6
+
+    def test_files_match_swath_number_of_segment(self, files):
+        segmenter = SwathSegmenter()
+        swath_numbers = np.concatenate([segmenter.update(file)
+                                        for file in files])
+        assert np.array_equal(swath_numbers,
+                              swath_number(np.concatenate(files)))
+
+    def test_files_with_different_scan_rates_are_segmented(self):
+        dayside = np.linspace(70, 110, num=200)
+        nightside = np.linspace(70, 110, num=10)
+        segmenter = SwathSegmenter()
+        swath_numbers = [segmenter.update(file) for file in
+                         [dayside, dayside, dayside, nightside]]
+        assert [np.unique(f).tolist() for f in swath_numbers] == \
+            [[0], [1], [2], [3]]
+
+    def test_serialized_state_resumes_segmentation(self, files):
+        segmenter = SwathSegmenter()
+        expected = [segmenter.update(file) for file in files]
+        segmenter = SwathSegmenter()
+        resumed = []
+        for file in files:
+            segmenter = SwathSegmenter(json.loads(json.dumps(
+                segmenter.state)))
+            resumed.append(segmenter.update(file))
+        assert np.array_equal(np.concatenate(resumed),
+                              np.concatenate(expected))
+
+    def test_single_integration_files_continue_swath(self):
+        segmenter = SwathSegmenter()
+        segmenter.update(np.array([40, 41, 42]))
+        assert segmenter.update(np.array([43])).tolist() == [0]
+        assert segmenter.update(np.array([30])).tolist() == [1]